@@ -1,161 +1,425 @@
-from flask import Flask, render_template
+from flask import Flask, Response, abort, render_template
 from flask_socketio import SocketIO, emit, disconnect, join_room, leave_room
 from flask import request
 import os
+import atexit
+import secrets
 import uuid
+import functools
 import logging
-import random
+import time
+
+from engine import CLASSIC, SIZE, check_winner, is_free, play
+from bots import BotPool
+from lobby import LobbyBroadcaster
+from store import create_store
+from room import Room
+from metrics import MetricsRegistry
+from profiler import SamplingProfiler
+from history import MatchHistory
+from spectators import SpectatorHub
+from logs import configure_logging
+
+# Backend do estado das salas: "memory" (um processo) ou "redis" (vários processos)
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "memory")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "secret!"
-socketio = SocketIO(app)
-
-# Configura logging
-logging.basicConfig(level=logging.DEBUG)
+# SERVER_MODE escolhe o modelo de concorrência (gevent, eventlet ou threading); ver server.py.
+# Com vários processos, a fila de mensagens entrega os emits de sala a clientes de qualquer processo.
+socketio = SocketIO(
+    app,
+    async_mode=os.environ.get("SERVER_MODE"),
+    message_queue=os.environ.get("MESSAGE_QUEUE", REDIS_URL if STATE_BACKEND == "redis" else None)
+)
+
+# O logging é configurado pelos pontos de entrada (ver logs.py), não na importação
 logger = logging.getLogger(__name__)
 
-# Dicionário para estados de todas as salas (multiplayer e bot)
-game_states = {}
-
-def get_or_create_room(room_id=None, force_new=False):
-    """Retorna uma sala multiplayer existente com menos de 2 jogadores ou cria uma nova."""
-    logger.debug(f"Procurando sala para room_id: {room_id}, force_new: {force_new}")
+# Estados de todas as salas (multiplayer e bot), índice de salas abertas e sessões
+store = create_store(STATE_BACKEND, REDIS_URL)
+
+# Salas sem nenhuma jogada ou entrada por ROOM_TTL segundos são removidas pelo
+# coletor, que roda a cada REAPER_INTERVAL segundos; MAX_ROOMS limita o total de salas
+ROOM_TTL = int(os.environ.get("ROOM_TTL", 1800))
+REAPER_INTERVAL = int(os.environ.get("REAPER_INTERVAL", 60))
+MAX_ROOMS = int(os.environ.get("MAX_ROOMS", 10000))
+
+metrics = MetricsRegistry()
+metrics.gauge("velha_rooms", "Salas existentes (multiplayer e bot)", store.room_count)
+rooms_evicted = metrics.counter("velha_rooms_evicted_total", "Salas removidas por inatividade")
+rooms_refused = metrics.counter("velha_rooms_refused_total", "Criações de sala recusadas pelo limite MAX_ROOMS")
+
+# Tentativas de reservar uma vaga quando outro jogador ocupa a sala escolhida ao mesmo tempo
+JOIN_ATTEMPTS = 5
+
+# Níveis do bot: "easy" (heurística) e "hard" (jogo perfeito pela tabela do solver no
+# 3×3, busca alfa-beta limitada pelo tempo de pensamento nos tabuleiros maiores)
+BOT_LEVELS = ("easy", "hard")
+
+# Tabuleiros de 3×3 até MAX_BOARD_SIZE×MAX_BOARD_SIZE, vencendo com K em linha (3 <= K <= tamanho)
+MAX_BOARD_SIZE = int(os.environ.get("MAX_BOARD_SIZE", 19))
+
+ROOMS_FULL_MESSAGE = "O servidor atingiu o limite de salas. Tente novamente em alguns minutos."
+
+# Segundos em que o assento de um jogador desconectado fica reservado para ele voltar
+# com o token recebido em assign_role (0 = libera o assento na hora, como antes)
+RESUME_GRACE = int(os.environ.get("RESUME_GRACE", 30))
+
+# Turnos do bot rodam num pool ("process" ou "thread"), em lotes de até BOT_BATCH_SIZE;
+# sem resposta em BOT_THINK_TIME ms, o bot faz a jogada simples do nível fácil.
+# Com python app.py o padrão é "thread": os processos do pool (spawn) reimportam o
+# módulo principal, e este montaria o app inteiro em cada um; o server.py não monta.
+BOT_EXECUTOR = os.environ.get("BOT_EXECUTOR", "thread" if __name__ == "__main__" else "process")
+BOT_WORKERS = int(os.environ.get("BOT_WORKERS", 0)) or None
+BOT_THINK_TIME = int(os.environ.get("BOT_THINK_TIME", 200))
+BOT_BATCH_SIZE = int(os.environ.get("BOT_BATCH_SIZE", 64))
+
+metrics.gauge("velha_open_rooms", "Salas multiplayer aguardando o segundo jogador", store.open_room_count)
+metrics.gauge("velha_seated_players", "Jogadores sentados em salas", store.session_count)
+connected_clients = metrics.gauge("velha_connected_clients", "Conexões Socket.IO abertas neste processo")
+event_seconds = metrics.histogram("velha_event_seconds", "Tempo de execução dos handlers do Socket.IO", ["event"])
+event_errors = metrics.counter("velha_event_errors_total", "Exceções nos handlers do Socket.IO", ["event"])
+bot_move_seconds = metrics.histogram("velha_bot_move_seconds", "Tempo entre a jogada do humano e a do bot", ["level"])
+bot_fallbacks = metrics.counter("velha_bot_fallbacks_total", "Turnos do bot resolvidos com a jogada simples por tempo esgotado")
+
+# Profiler por amostragem, ligado e desligado em /debug/profiler/* quando PROFILER_ENABLED=1
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED") == "1"
+profiler = SamplingProfiler(interval=float(os.environ.get("PROFILER_INTERVAL", 5)) / 1000)
+metrics.gauge("velha_profiler_running", "1 se o profiler por amostragem estiver ligado",
+              lambda: int(profiler.running))
+
+def on_event(event):
+    """Registra o handler no Socket.IO medindo duração e exceções em /metrics."""
+    def decorator(handler):
+        # O Flask-SocketIO passa ao handler de "connect" o argumento auth apenas se ele aceitar
+        arg_count = handler.__code__.co_argcount
+        series = event_seconds.labels(event)
+        errors = event_errors.labels(event)
+
+        @functools.wraps(handler)
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return handler(*args[:arg_count])
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                series.observe(time.perf_counter() - start)
+        return socketio.on(event)(timed)
+    return decorator
+
+def get_or_create_room(room_id=None, force_new=False, size=SIZE, win_length=SIZE):
+    """Retorna uma sala multiplayer existente com menos de 2 jogadores ou cria uma nova.
+
+    ``size`` e ``win_length`` valem apenas para a sala criada. Retorna None se for preciso criar uma sala e o limite MAX_ROOMS já tiver sido atingido.
+    """
+    logger.debug("Procurando sala para room_id: %s, force_new: %s", room_id, force_new)
     if not force_new:
-        if room_id and room_id in game_states and len(game_states[room_id]["players"]) < 2 and not room_id.startswith("bot_"):
-            logger.debug(f"Entrando na sala existente: {room_id}")
+        if room_id and store.is_open(room_id):
+            logger.debug("Entrando na sala existente: %s", room_id)
             return room_id
-        for rid, state in game_states.items():
-            if len(state["players"]) < 2 and not rid.startswith("bot_"):
-                logger.debug(f"Entrando na sala disponível: {rid}")
-                return rid
+        rid = store.first_open_room()
+        if rid:
+            logger.debug("Entrando na sala disponível: %s", rid)
+            return rid
     new_room_id = str(uuid.uuid4())[:8]
-    game_states[new_room_id] = {
-        "board": [["" for _ in range(3)] for _ in range(3)],
-        "current_player": "X",
-        "winner": None,
-        "game_over": False,
-        "scoreboard": {"Draw": 0},
-        "players": {},
-        "is_bot_game": False
-    }
-    logger.debug(f"Criada nova sala multiplayer: {new_room_id}")
+    state = Room(size=size, win_length=win_length)
+    if not store.create_room(new_room_id, state, MAX_ROOMS):
+        logger.warning("Limite de %s salas atingido, sala nova recusada", MAX_ROOMS, extra={"event": "room_refused"})
+        rooms_refused.inc()
+        return None
+    update_room_index(new_room_id, state)
+    logger.debug("Criada nova sala multiplayer: %s", new_room_id)
     return new_room_id
 
+def board_rules(data):
+    """Lê o tamanho do tabuleiro e o K do pedido; retorna (tamanho, K) ou None se forem inválidos."""
+    try:
+        size = int(data.get("size", SIZE))
+        win_length = int(data.get("win_length", min(size, 5)))
+    except (TypeError, ValueError):
+        return None
+    if not (SIZE <= size <= MAX_BOARD_SIZE and SIZE <= win_length <= size):
+        return None
+    return size, win_length
+
 def get_available_rooms():
     """Retorna a lista de salas multiplayer com menos de 2 jogadores."""
-    return [room_id for room_id, state in game_states.items() if len(state["players"]) < 2 and not room_id.startswith("bot_")]
-
-def check_winner(board):
-    for row in board:
-        if row[0] == row[1] == row[2] != "":
-            return row[0]
-    for col in range(3):
-        if board[0][col] == board[1][col] == board[2][col] != "":
-            return board[0][col]
-    if board[0][0] == board[1][1] == board[2][2] != "":
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] != "":
-        return board[0][2]
-    if all(cell != "" for row in board for cell in row):
-        return "Draw"
-    return None
-
-def get_player_names(room_id):
-    """Retorna os nomes dos jogadores na sala."""
-    state = game_states.get(room_id, {"players": {}})
-    player_x_name = None
-    player_o_name = None
-    for sid, info in state["players"].items():
-        if info["role"] == "X":
-            player_x_name = info["name"]
-        elif info["role"] == "O":
-            player_o_name = info["name"]
-    return player_x_name, player_o_name
-
-def bot_make_move(room_id):
-    """Lógica do bot para fazer uma jogada como O."""
-    state = game_states[room_id]
-    board = state["board"]
-    logger.debug(f"Bot fazendo jogada na sala {room_id}")
-
-    # Função auxiliar para verificar se uma jogada vence
-    def can_win(player, row, col):
-        temp = board[row][col]
-        board[row][col] = player
-        winner = check_winner(board)
-        board[row][col] = temp
-        return winner == player
-
-    # 1. Jogar para vencer (O)
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == "":
-                if can_win("O", i, j):
-                    board[i][j] = "O"
-                    logger.debug(f"Bot jogou em ({i}, {j}) para vencer")
-                    return i, j
-
-    # 2. Bloquear vitória do jogador (X)
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == "":
-                if can_win("X", i, j):
-                    board[i][j] = "O"
-                    logger.debug(f"Bot jogou em ({i}, {j}) para bloquear X")
-                    return i, j
-
-    # 3. Jogar aleatoriamente
-    empty_cells = [(i, j) for i in range(3) for j in range(3) if board[i][j] == ""]
-    if empty_cells:
-        i, j = random.choice(empty_cells)
-        board[i][j] = "O"
-        logger.debug(f"Bot jogou aleatoriamente em ({i}, {j})")
-        return i, j
-
-    logger.warning(f"Bot não encontrou jogadas válidas na sala {room_id}")
-    return None
+    return store.list_open_rooms()
+
+def update_room_index(room_id, state):
+    """Atualiza o índice de salas abertas após entrada ou saída de jogadores (state None = sala removida).
+
+    Uma sala cujo único jogador está desconectado (assento reservado) sai do lobby até ele voltar.
+    """
+    if (state is not None and not state.is_bot_game and not state.is_full()
+            and any(player.away_since is None for player in state.players.values())):
+        if store.open_room(room_id):
+            lobby.room_opened(room_id)
+    elif store.close_room(room_id):
+        lobby.room_closed(room_id)
+
+# Lista de salas enviada em diffs agrupados apenas para quem está no lobby
+lobby = LobbyBroadcaster(
+    socketio,
+    get_available_rooms,
+    interval=int(os.environ.get("LOBBY_BROADCAST_INTERVAL", 100)) / 1000
+)
+
+def apply_bot_turn(turn, index, fallback):
+    """Aplica a jogada calculada pelo pool, se a sala ainda estiver esperando por ela."""
+    with store.lock(turn.room_id):
+        state = store.get_room(turn.room_id)
+        # A sala pode ter sido reiniciada, esvaziada ou removida enquanto o bot pensava
+        if state is None or state.seq != turn.seq or state.game_over or state.current_player != "O":
+            logger.debug("Jogada do bot descartada na sala %s", turn.room_id)
+            return
+        if index is None or not is_free(state.board, index):
+            logger.warning("Bot não encontrou jogadas válidas na sala %s", turn.room_id)
+            return
+        move = apply_move(turn.room_id, state, index)
+        store.save_room(turn.room_id, state)
+    bot_move_seconds.labels(turn.level).observe(time.perf_counter() - turn.submitted)
+    if fallback:
+        bot_fallbacks.inc()
+    logger.debug("Bot jogou em %s (%s) na sala %s", divmod(index, turn.size), turn.level, turn.room_id,
+                 extra={"event": "bot_move", "room_id": turn.room_id, "cell": index, "bot_level": turn.level})
+    socketio.emit("move", move, room=turn.room_id)
+    spectators.publish(turn.room_id, "move", move)
+
+bot_pool = BotPool(
+    socketio,
+    apply_bot_turn,
+    executor=BOT_EXECUTOR,
+    workers=BOT_WORKERS,
+    think_time=BOT_THINK_TIME / 1000,
+    batch_size=BOT_BATCH_SIZE
+)
+metrics.gauge("velha_bot_pending_turns", "Turnos do bot na fila", bot_pool.pending_count)
+# Os caches de posições ficam nos processos do pool; os contadores voltam com cada lote
+metrics.counter("velha_position_cache_hits_total", "Acertos do cache de posições do pool do bot",
+                read=bot_pool.cache_hits)
+metrics.counter("velha_position_cache_misses_total", "Faltas do cache de posições do pool do bot",
+                read=bot_pool.cache_misses)
+metrics.counter("velha_position_cache_evictions_total", "Posições despejadas do cache do pool do bot pelo limite",
+                read=bot_pool.cache_evictions)
+
+# Partidas encerradas vão para o SQLite em HISTORY_DB, gravadas em lotes a cada HISTORY_FLUSH_INTERVAL ms
+match_history = MatchHistory(
+    socketio,
+    os.environ.get("HISTORY_DB", "history.db"),
+    interval=int(os.environ.get("HISTORY_FLUSH_INTERVAL", 1000)) / 1000
+)
+atexit.register(match_history.close)
+
+# Espectadores: até MAX_SPECTATORS por sala, recebendo os eventos agrupados a cada
+# SPECTATOR_INTERVAL ms; quem acumula mais de SPECTATOR_BACKLOG pacotes sem ler é desconectado
+spectators = SpectatorHub(
+    socketio,
+    store,
+    interval=int(os.environ.get("SPECTATOR_INTERVAL", 50)) / 1000,
+    max_viewers=int(os.environ.get("MAX_SPECTATORS", 5000)),
+    max_backlog=int(os.environ.get("SPECTATOR_BACKLOG", 256))
+)
+metrics.gauge("velha_spectators", "Espectadores conectados a este processo", spectators.total_viewers)
+metrics.counter("velha_spectators_dropped_total", "Espectadores desconectados por não acompanharem a transmissão",
+                read=lambda: spectators.dropped)
+metrics.gauge("velha_history_pending_matches", "Partidas encerradas aguardando gravação no histórico",
+              match_history.pending_count)
+metrics.counter("velha_history_matches_total", "Partidas gravadas no histórico por este processo",
+                read=lambda: match_history.recorded)
+
+def apply_move(room_id, state, index):
+    """Aplica a jogada do jogador da vez e retorna o evento compacto "move"."""
+    mark = state.current_player
+    play(state.board, mark, index)
+    state.moves.append(index)
+    rules = state.rules
+    # No 3×3, as máscaras das linhas de cada casa; nos maiores, a contagem em O(K)
+    winner = check_winner(state.board, index) if rules is CLASSIC else rules.check_winner(state.board, index)
+    state.seq += 1
+    move = {"cell": index, "mark": mark, "seq": state.seq}
+    if winner:
+        state.game_over = True
+        state.winner = winner
+        scorer = "Draw" if winner == "Draw" else state.player_name(winner)
+        state.scoreboard[scorer] += 1
+        move["winner"] = winner
+        move["score"] = {scorer: state.scoreboard[scorer]}
+        match_history.record({
+            "room_id": room_id,
+            "size": state.size,
+            "win_length": state.win_length,
+            "player_x": state.player_name("X"),
+            "player_o": state.player_name("O"),
+            "winner": winner,
+            "moves": list(state.moves),
+            "bot_level": state.bot_level if state.is_bot_game else None,
+            "started_at": state.started_at
+        })
+    else:
+        state.current_player = "O" if mark == "X" else "X"
+    return move
+
+def with_room_lock(handler):
+    """Executa o handler segurando o lock da sala informada em data["room_id"]."""
+    @functools.wraps(handler)
+    def wrapper(data):
+        room_id = data.get("room_id")
+        if not room_id:
+            return handler(data)
+        with store.lock(room_id):
+            return handler(data)
+    return wrapper
+
+def evict_room(room_id):
+    """Remove uma sala inativa, mandando os jogadores de volta ao menu; retorna True se removeu."""
+    with store.lock(room_id):
+        state = store.get_room(room_id)
+        # A sala pode ter recebido uma jogada entre a varredura e o lock
+        if state is None or not store.is_idle(room_id, ROOM_TTL):
+            return False
+        for sid in state.players:
+            if sid == "bot":
+                continue
+            store.pop_session(sid)
+            socketio.emit("player_left", {
+                "message": "A sala foi encerrada por inatividade. Você será redirecionado ao menu.",
+                "player_x_name": None,
+                "player_o_name": None,
+                "force_menu": True
+            }, to=sid)
+        socketio.close_room(room_id)
+        store.delete_room(room_id)
+        update_room_index(room_id, None)
+        spectators.close(room_id)
+    rooms_evicted.inc()
+    logger.debug("Sala %s removida por inatividade", room_id, extra={"event": "room_evicted", "room_id": room_id})
+    return True
+
+def reap_idle_rooms():
+    """Remove todas as salas sem atividade há mais de ROOM_TTL segundos."""
+    evicted = 0
+    while True:
+        idle = store.idle_rooms(ROOM_TTL)
+        removed = sum(1 for room_id in idle if evict_room(room_id))
+        evicted += removed
+        # Salas que voltaram à atividade continuam no início da lista; não insiste nelas
+        if not idle or not removed:
+            return evicted
+
+def room_reaper():
+    while True:
+        socketio.sleep(REAPER_INTERVAL)
+        try:
+            evicted = reap_idle_rooms()
+        except Exception:
+            logger.exception("Falha ao remover salas inativas")
+            continue
+        if evicted:
+            logger.info("%s sala(s) inativa(s) removida(s); %s restantes", evicted, store.room_count())
+
+def start_background_tasks():
+    """Inicia as tarefas de fundo do servidor (chamado pelos pontos de entrada, não na importação)."""
+    socketio.start_background_task(room_reaper)
+    bot_pool.start()
 
 @app.route("/")
 def index():
     return render_template("index.html")
 
-@socketio.on("connect")
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/leaderboard")
+def leaderboard():
+    """Ranking global por vitórias, a partir do histórico de partidas (?limit=, de 1 a 100)."""
+    # O SQLite trata LIMIT negativo como "sem limite"
+    limit = max(1, min(request.args.get("limit", 10, type=int), 100))
+    return {"players": match_history.leaderboard(limit)}
+
+@app.route("/players/<name>")
+def player_stats(name):
+    """Vitórias, derrotas e empates do jogador e as suas últimas partidas."""
+    return dict(match_history.player_stats(name), matches=match_history.recent_matches(name))
+
+@app.route("/debug/profiler/start", methods=["POST"])
+def profiler_start():
+    if not PROFILER_ENABLED:
+        abort(404)
+    started = profiler.start()
+    logger.info("Profiler ligado" if started else "Profiler já estava ligado")
+    return {"running": True, "started": started}
+
+@app.route("/debug/profiler/stop", methods=["POST"])
+def profiler_stop():
+    """Desliga o profiler e retorna as pilhas amostradas no formato collapsed (flamegraph)."""
+    if not PROFILER_ENABLED:
+        abort(404)
+    stacks = profiler.stop()
+    logger.info("Profiler desligado após %s amostras", profiler.samples)
+    return Response(stacks, mimetype="text/plain")
+
+@on_event("connect")
 def handle_connect():
-    logger.debug(f"Novo cliente conectado: {request.sid}")
-    emit("update_rooms", {"rooms": get_available_rooms()})
+    logger.debug("Novo cliente conectado: %s", request.sid, extra={"event": "connect", "sid": request.sid})
+    connected_clients.inc()
+    lobby.subscribe(request.sid)
 
-@socketio.on("get_rooms")
+@on_event("get_rooms")
 def handle_get_rooms():
-    logger.debug(f"Cliente {request.sid} solicitou lista de salas")
-    emit("update_rooms", {"rooms": get_available_rooms()})
+    logger.debug("Cliente %s solicitou lista de salas", request.sid)
+    lobby.subscribe(request.sid)
 
-@socketio.on("start_bot_game")
+@on_event("start_bot_game")
 def handle_start_bot_game(data):
     sid = request.sid
     player_name = data.get("player_name", "").strip()
-    logger.debug(f"Jogador {sid} iniciando jogo contra bot, nome: {player_name}")
+    bot_level = data.get("difficulty", "easy")
+    logger.debug("Jogador %s iniciando jogo contra bot, nome: %s, nível: %s", sid, player_name, bot_level)
 
     if not player_name or len(player_name) > 20:
-        logger.error(f"Nome inválido: {player_name}")
+        logger.error("Nome inválido: %s", player_name)
         emit("error", {"message": "Digite um nome válido (1 a 20 caracteres)."})
         return
 
+    if bot_level not in BOT_LEVELS:
+        logger.error("Nível inválido: %s", bot_level)
+        emit("error", {"message": "Nível do bot inválido."})
+        return
+
+    rules = board_rules(data)
+    if rules is None:
+        logger.error("Tabuleiro inválido: %s x %s", data.get("size"), data.get("win_length"))
+        emit("error", {"message": f"Tabuleiro inválido (de 3x3 até {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE})."})
+        return
+
     # Cria uma sala especial para o jogo contra bot
     room_id = f"bot_{sid}"
-    game_states[room_id] = {
-        "board": [["" for _ in range(3)] for _ in range(3)],
-        "current_player": "X",
-        "winner": None,
-        "game_over": False,
-        "scoreboard": {player_name: 0, "Bot": 0, "Draw": 0},
-        "players": {
-            sid: {"role": "X", "name": player_name},
-            "bot": {"role": "O", "name": "Bot"}
-        },
-        "is_bot_game": True
-    }
+    state = Room(is_bot_game=True, bot_level=bot_level, size=rules[0], win_length=rules[1])
+    token = secrets.token_urlsafe(16)
+    state.add_player(sid, "X", player_name, token)
+    state.add_player("bot", "O", "Bot")
+    # A sala anterior do mesmo cliente pode estar recebendo a última jogada do bot no
+    # pool; sem o lock, essa gravação sobrescreveria a sala nova com a partida encerrada
+    with store.lock(room_id):
+        created = store.create_room(room_id, state, MAX_ROOMS)
+    if not created:
+        logger.warning("Limite de %s salas atingido, jogo contra bot recusado", MAX_ROOMS,
+                       extra={"event": "room_refused", "sid": sid})
+        rooms_refused.inc()
+        emit("error", {"message": ROOMS_FULL_MESSAGE})
+        return
+    store.set_session(sid, {"room_id": room_id, "role": "X"})
+    lobby.unsubscribe(sid)
+    spectators.unwatch(sid)
     join_room(room_id)
-    logger.debug(f"Jogador {sid} ({player_name}) iniciou jogo contra bot na sala {room_id}")
+    logger.debug("Jogador %s (%s) iniciou jogo contra bot na sala %s", sid, player_name, room_id,
+                 extra={"event": "bot_game_started", "room_id": room_id, "sid": sid, "bot_level": bot_level})
 
     # Envia o estado inicial
     emit("assign_role", {
@@ -163,372 +427,384 @@ def handle_start_bot_game(data):
         "message": f"Você é o jogador {player_name} (X) contra o Bot (O).",
         "room_id": room_id,
         "player_x_name": player_name,
-        "player_o_name": "Bot"
+        "player_o_name": "Bot",
+        "token": token
     }, to=sid)
 
-    emit("game_start", {
-        "message": "Jogo contra Bot começou!",
-        "board": game_states[room_id]["board"],
-        "current_player": "X",
-        "winner": None,
-        "game_over": False,
-        "scoreboard": game_states[room_id]["scoreboard"],
-        "num_players": 2,
-        "player_x_name": player_name,
-        "player_o_name": "Bot"
-    }, to=sid)
+    payload = state.to_payload()
+    emit("game_start", dict(payload, message="Jogo contra Bot começou!"), to=sid)
 
-    emit("update", {
-        "board": game_states[room_id]["board"],
-        "current_player": "X",
-        "winner": None,
-        "game_over": False,
-        "scoreboard": game_states[room_id]["scoreboard"],
-        "num_players": 2,
-        "player_x_name": player_name,
-        "player_o_name": "Bot"
-    }, to=sid)
+    emit("update", payload, to=sid)
 
-@socketio.on("join_game")
+@on_event("join_game")
 def handle_join_game(data):
     sid = request.sid
     room_id = data.get("room_id")
     create_new = data.get("create_new", False)
     player_name = data.get("player_name", "").strip()
-    logger.debug(f"Jogador {sid} tentando entrar na sala: {room_id}, create_new: {create_new}, nome: {player_name}")
+    logger.debug("Jogador %s tentando entrar na sala: %s, create_new: %s, nome: %s", sid, room_id, create_new, player_name)
 
     if not player_name or len(player_name) > 20:
-        logger.error(f"Nome inválido: {player_name}")
+        logger.error("Nome inválido: %s", player_name)
         emit("error", {"message": "Digite um nome válido (1 a 20 caracteres)."})
         return
 
-    if room_id and room_id not in game_states:
-        logger.error(f"Sala inválida: {room_id}")
-        emit("error", {"message": "Sala inválida ou não existe."})
-        return
-    if room_id and len(game_states[room_id]["players"]) >= 2:
-        logger.warning(f"Sala {room_id} já tem 2 jogadores")
-        emit("error", {"message": "Esta sala já tem 2 jogadores. Escolha outra sala."})
+    if room_id:
+        state = store.get_room(room_id)
+        if state is None:
+            logger.error("Sala inválida: %s", room_id)
+            emit("error", {"message": "Sala inválida ou não existe."})
+            return
+        if state.is_full():
+            logger.warning("Sala %s já tem 2 jogadores", room_id)
+            emit("error", {"message": "Esta sala já tem 2 jogadores. Escolha outra sala."})
+            return
+
+    # Tamanho e K só valem para a sala nova; quem entra numa sala existente joga no tabuleiro dela
+    rules = board_rules(data)
+    if rules is None:
+        logger.error("Tabuleiro inválido: %s x %s", data.get("size"), data.get("win_length"))
+        emit("error", {"message": f"Tabuleiro inválido (de 3x3 até {MAX_BOARD_SIZE}x{MAX_BOARD_SIZE})."})
         return
 
-    room_id = get_or_create_room(room_id, force_new=create_new)
-    state = game_states[room_id]
-    if len(state["players"]) >= 2:
-        logger.warning(f"Sala {room_id} já tem 2 jogadores")
+    # A sala escolhida é conferida de novo sob o lock: outro jogador pode ter
+    # ocupado a última vaga entre a escolha e o lock. Nesse caso, tenta outra sala.
+    for _ in range(JOIN_ATTEMPTS):
+        room_id = get_or_create_room(room_id, force_new=create_new, size=rules[0], win_length=rules[1])
+        if room_id is None:
+            emit("error", {"message": ROOMS_FULL_MESSAGE})
+            return
+        with store.lock(room_id):
+            state = store.get_room(room_id)
+            if state is not None and not state.is_full():
+                # Quem sobrou numa sala pode ser o O; a vaga livre é a do papel que falta
+                if state.player_name("X") is None:
+                    role = "X"
+                    message = f"Você é o jogador {player_name} (X) na sala {room_id}. Aguardando o jogador O..."
+                else:
+                    role = "O"
+                    message = f"Você é o jogador {player_name} (O) na sala {room_id}. O jogo pode começar!"
+                token = secrets.token_urlsafe(16)
+                state.add_player(sid, role, player_name, token)
+                store.save_room(room_id, state)
+                update_room_index(room_id, state)
+                store.set_session(sid, {"room_id": room_id, "role": role})
+                # Os payloads são montados ainda sob o lock; os emits podem ocorrer depois
+                payload = state.to_payload()
+                break
+    else:
+        logger.warning("Sala %s já tem 2 jogadores", room_id)
         emit("error", {"message": "Esta sala já tem 2 jogadores. Escolha outra sala."})
         disconnect()
         return
 
-    if len(state["players"]) == 0:
-        state["players"][sid] = {"role": "X", "name": player_name}
-        role = "X"
-        message = f"Você é o jogador {player_name} (X) na sala {room_id}. Aguardando o jogador O..."
-        state["scoreboard"][player_name] = 0
-    else:
-        state["players"][sid] = {"role": "O", "name": player_name}
-        role = "O"
-        message = f"Você é o jogador {player_name} (O) na sala {room_id}. O jogo pode começar!"
-        state["scoreboard"][player_name] = 0
-
+    lobby.unsubscribe(sid)
+    # Um espectador que ocupa uma vaga deixa de assistir (inclusive a esta sala)
+    spectators.unwatch(sid)
     join_room(room_id)
-    logger.debug(f"Jogador {sid} ({player_name}) entrou na sala {room_id} como {role}")
+    logger.debug("Jogador %s (%s) entrou na sala %s como %s", sid, player_name, room_id, role,
+                 extra={"event": "join", "room_id": room_id, "sid": sid, "role": role})
 
-    player_x_name, player_o_name = get_player_names(room_id)
     emit("assign_role", {
         "role": role,
         "message": message,
         "room_id": room_id,
-        "player_x_name": player_x_name,
-        "player_o_name": player_o_name
+        "player_x_name": payload["player_x_name"],
+        "player_o_name": payload["player_o_name"],
+        "token": token
     }, to=sid)
 
-    if len(state["players"]) == 2:
-        logger.debug(f"Sala {room_id}: Segundo jogador entrou, jogo começando")
-        emit("game_start", {
-            "message": f"Sala {room_id}: O jogo começou!",
-            "board": state["board"],
-            "current_player": state["current_player"],
-            "winner": state["winner"],
-            "game_over": state["game_over"],
-            "scoreboard": state["scoreboard"],
-            "num_players": len(state["players"]),
-            "player_x_name": player_x_name,
-            "player_o_name": player_o_name
-        }, room=room_id)
-
-    emit("update", {
-        "board": state["board"],
-        "current_player": state["current_player"],
-        "winner": state["winner"],
-        "game_over": state["game_over"],
-        "scoreboard": state["scoreboard"],
-        "num_players": len(state["players"]),
-        "player_x_name": player_x_name,
-        "player_o_name": player_o_name
-    }, to=sid)
+    if payload["num_players"] == 2:
+        logger.debug("Sala %s: Segundo jogador entrou, jogo começando", room_id)
+        emit("game_start", dict(payload, message=f"Sala {room_id}: O jogo começou!"), room=room_id)
+        spectators.publish(room_id, "update", payload)
+
+    emit("update", payload, to=sid)
+
+def remove_player(room_id, state, sid):
+    """Remove o jogador da sala, avisa o adversário e apaga a sala se ela ficar vazia.
 
-    emit("update_rooms", {"rooms": get_available_rooms()}, broadcast=True)
+    Usa socketio.emit para também servir à expiração do assento, fora de um handler.
+    """
+    player_name = state.remove_player(sid).name
 
-@socketio.on("leave_game")
+    if state.is_bot_game:
+        logger.debug("Removendo sala de bot: %s", room_id)
+        store.delete_room(room_id)
+        spectators.close(room_id)
+        return
+
+    if state.players:
+        socketio.emit("player_left", {
+            "message": f"{player_name} abandonou a partida. Você será redirecionado ao menu.",
+            "player_x_name": state.player_name("X"),
+            "player_o_name": state.player_name("O"),
+            "force_menu": True
+        }, to=room_id)
+        state.reset_board()
+        store.save_room(room_id, state)
+        payload = state.to_payload()
+        socketio.emit("update", payload, to=room_id)
+        spectators.publish(room_id, "update", payload)
+    else:
+        logger.debug("Sala %s vazia, removendo", room_id)
+        store.delete_room(room_id)
+        spectators.close(room_id)
+        state = None
+    update_room_index(room_id, state)
+
+@on_event("leave_game")
+@with_room_lock
 def handle_leave_game(data):
     sid = request.sid
     room_id = data.get("room_id")
-    logger.debug(f"Jogador {sid} tentando sair da sala: {room_id}")
+    logger.debug("Jogador %s tentando sair da sala: %s", sid, room_id)
 
-    if not room_id or room_id not in game_states:
-        logger.error(f"Sala inválida: {room_id}")
+    state = store.get_room(room_id) if room_id else None
+    if state is None:
+        logger.error("Sala inválida: %s", room_id)
         emit("error", {"message": "Sala inválida."})
         return
 
-    state = game_states[room_id]
-    if sid not in state["players"]:
-        logger.warning(f"Jogador {sid} não está na sala {room_id}")
+    if sid not in state.players:
+        logger.warning("Jogador %s não está na sala %s", sid, room_id)
         emit("error", {"message": "Você não está nesta sala."})
         return
 
-    player_name = state["players"][sid]["name"]
+    logger.debug("Jogador %s (%s) saiu da sala %s", sid, state.players[sid].name, room_id,
+                 extra={"event": "leave", "room_id": room_id, "sid": sid})
+    store.pop_session(sid)
     leave_room(room_id)
-    del state["players"][sid]
-    if player_name in state["scoreboard"]:
-        del state["scoreboard"][player_name]
-
-    logger.debug(f"Jogador {sid} ({player_name}) saiu da sala {room_id}")
+    remove_player(room_id, state, sid)
+    emit("leave_game_success", {"message": "Você voltou ao menu."}, to=sid)
 
-    if state["is_bot_game"]:
-        logger.debug(f"Removendo sala de bot: {room_id}")
-        del game_states[room_id]
-        emit("leave_game_success", {"message": "Você voltou ao menu."}, to=sid)
-    else:
-        player_x_name, player_o_name = get_player_names(room_id)
-        if state["players"]:
-            emit("player_left", {
-                "message": f"{player_name} abandonou a partida. Você será redirecionado ao menu.",
-                "player_x_name": player_x_name,
-                "player_o_name": player_o_name,
-                "force_menu": true
-            }, room=room_id)
-            state.update({
-                "board": [["" for _ in range(3)] for _ in range(3)],
-                "current_player": "X",
-                "winner": None,
-                "game_over": False
-            })
-            emit("update", {
-                "board": state["board"],
-                "current_player": state["current_player"],
-                "winner": state["winner"],
-                "game_over": state["game_over"],
-                "scoreboard": state["scoreboard"],
-                "num_players": len(state["players"]),
-                "player_x_name": player_x_name,
-                "player_o_name": player_o_name
-            }, room=room_id)
-        else:
-            logger.debug(f"Sala {room_id} vazia, removendo")
-            del game_states[room_id]
-
-        emit("leave_game_success", {"message": "Você voltou ao menu."}, to=sid)
-
-    emit("update_rooms", {"rooms": get_available_rooms()}, broadcast=True)
-
-@socketio.on("disconnect")
+@on_event("disconnect")
 def handle_disconnect():
     sid = request.sid
-    logger.debug(f"Jogador {sid} desconectado")
-    for room_id, state in list(game_states.items()):
-        if sid in state["players"]:
-            player_name = state["players"][sid]["name"]
-            logger.debug(f"Jogador {sid} ({player_name}) saiu da sala {room_id} por desconexão")
-            leave_room(room_id)
-            del state["players"][sid]
-            if player_name in state["scoreboard"]:
-                del state["scoreboard"][player_name]
-            if state["is_bot_game"]:
-                logger.debug(f"Removendo sala de bot: {room_id}")
-                del game_states[room_id]
-            else:
-                player_x_name, player_o_name = get_player_names(room_id)
-                if state["players"]:
-                    emit("player_left", {
-                        "message": f"{player_name} abandonou a partida. Você será redirecionado ao menu.",
-                        "player_x_name": player_x_name,
-                        "player_o_name": player_o_name,
-                        "force_menu": true
-                    }, room=room_id)
-                    state.update({
-                        "board": [["" for _ in range(3)] for _ in range(3)],
-                        "current_player": "X",
-                        "winner": None,
-                        "game_over": False
-                    })
-                    emit("update", {
-                        "board": state["board"],
-                        "current_player": state["current_player"],
-                        "winner": state["winner"],
-                        "game_over": state["game_over"],
-                        "scoreboard": state["scoreboard"],
-                        "num_players": len(state["players"]),
-                        "player_x_name": player_x_name,
-                        "player_o_name": player_o_name
-                    }, room=room_id)
-                else:
-                    logger.debug(f"Sala {room_id} vazia, removendo")
-                    del game_states[room_id]
-            break
-    emit("update_rooms", {"rooms": get_available_rooms()}, broadcast=True)
+    logger.debug("Jogador %s desconectado", sid, extra={"event": "disconnect", "sid": sid})
+    connected_clients.dec()
+    # Quem assistia e depois sentou já saiu dos espectadores; a vaga é conferida de qualquer forma
+    spectators.unwatch(sid, leave=False)
+    session = store.pop_session(sid)
+    if not session:
+        return
+    room_id = session["room_id"]
+    with store.lock(room_id):
+        state = store.get_room(room_id)
+        if state is None or sid not in state.players:
+            return
+        player = state.players[sid]
+        if not RESUME_GRACE:
+            logger.debug("Jogador %s (%s) saiu da sala %s por desconexão", sid, player.name, room_id,
+                         extra={"event": "leave", "room_id": room_id, "sid": sid})
+            remove_player(room_id, state, sid)
+            return
+        # O assento fica reservado; o jogador volta com resume_game ou sai quando o prazo acabar
+        player.away_since = time.time()
+        store.save_room(room_id, state)
+        update_room_index(room_id, state)
+    logger.debug("Jogador %s (%s) desconectou da sala %s; assento reservado por %s s",
+                 sid, player.name, room_id, RESUME_GRACE, extra={"event": "seat_held", "room_id": room_id, "sid": sid})
+    away = {"role": player.role, "name": player.name, "grace": RESUME_GRACE}
+    socketio.emit("player_away", away, to=room_id)
+    spectators.publish(room_id, "player_away", away)
+    socketio.start_background_task(expire_seat, room_id, sid, player.away_since)
+
+def expire_seat(room_id, sid, away_since):
+    """Libera o assento reservado se o jogador não tiver voltado dentro de RESUME_GRACE."""
+    socketio.sleep(RESUME_GRACE)
+    with store.lock(room_id):
+        state = store.get_room(room_id)
+        player = state.players.get(sid) if state is not None else None
+        # Quem voltou trocou de sid; um away_since diferente é de outra desconexão
+        if player is None or player.away_since != away_since:
+            return
+        logger.debug("Jogador %s (%s) não voltou à sala %s", sid, player.name, room_id,
+                     extra={"event": "seat_expired", "room_id": room_id, "sid": sid})
+        remove_player(room_id, state, sid)
+
+@on_event("resume_game")
+def handle_resume_game(data):
+    """Devolve o assento reservado a um cliente reconectado, com um snapshot compacto da sala."""
+    sid = request.sid
+    room_id = data.get("room_id")
+    token = data.get("token")
+    if not room_id or not token:
+        emit("resume_failed", {"message": "Sessão inválida."})
+        return
+    with store.lock(room_id):
+        state = store.get_room(room_id)
+        player = state.resume_player(token, sid) if state is not None else None
+        if player is None:
+            logger.debug("Retomada recusada na sala %s para %s", room_id, sid,
+                         extra={"event": "resume_failed", "room_id": room_id, "sid": sid})
+            emit("resume_failed", {"message": "A partida anterior foi encerrada."})
+            return
+        store.save_room(room_id, state)
+        update_room_index(room_id, state)
+        store.set_session(sid, {"room_id": room_id, "role": player.role})
+        snapshot = state.to_snapshot()
+    lobby.unsubscribe(sid)
+    spectators.unwatch(sid)
+    join_room(room_id)
+    logger.debug("Jogador %s (%s) retomou a sala %s como %s", sid, player.name, room_id, player.role,
+                 extra={"event": "resume", "room_id": room_id, "sid": sid, "role": player.role})
+    emit("resumed", dict(snapshot, room_id=room_id, role=player.role, token=token), to=sid)
+    back = {"role": player.role, "name": player.name}
+    emit("player_back", back, room=room_id, include_self=False)
+    spectators.publish(room_id, "player_back", back)
+
+@on_event("watch_game")
+def handle_watch_game(data):
+    """Entra na sala como espectador (só leitura), recebendo o estado atual e depois os eventos agrupados."""
+    sid = request.sid
+    room_id = data.get("room_id")
+    state = store.get_room(room_id) if room_id else None
+    if state is None:
+        logger.error("Sala inválida para assistir: %s", room_id)
+        emit("error", {"message": "Sala inválida ou não existe."})
+        return
+    if sid in state.players or store.get_session(sid):
+        emit("error", {"message": "Saia da partida atual para assistir outra sala."})
+        return
+    previous = spectators.room_of(sid)
+    if previous and previous != room_id:
+        spectators.unwatch(sid)
+    if not spectators.watch(sid, room_id):
+        logger.warning("Sala %s atingiu o limite de espectadores", room_id)
+        emit("error", {"message": "Esta sala atingiu o limite de espectadores."})
+        return
+    lobby.unsubscribe(sid)
+    logger.debug("Cliente %s assistindo à sala %s", sid, room_id, extra={"event": "watch", "room_id": room_id, "sid": sid})
+    # O estado é lido de novo depois da inscrição: eventos posteriores chegam pelo grupo, com seq maior
+    state = store.get_room(room_id)
+    if state is None:
+        spectators.unwatch(sid)
+        emit("error", {"message": "Sala inválida ou não existe."})
+        return
+    emit("watching", dict(state.to_snapshot(), room_id=room_id), to=sid)
 
-@socketio.on("make_move")
+@on_event("stop_watching")
+def handle_stop_watching():
+    sid = request.sid
+    room_id = spectators.unwatch(sid)
+    logger.debug("Cliente %s deixou de assistir à sala %s", sid, room_id)
+    emit("leave_game_success", {"message": "Você voltou ao menu."}, to=sid)
+
+@on_event("make_move")
+@with_room_lock
 def handle_move(data):
     sid = request.sid
     room_id = data.get("room_id")
-    if room_id not in game_states:
-        logger.error(f"Sala inválida: {room_id}")
+    state = store.get_room(room_id) if room_id else None
+    if state is None:
+        logger.error("Sala inválida: %s", room_id)
         emit("error", {"message": "Sala inválida."})
         return
-    state = game_states[room_id]
-    if sid not in state["players"]:
-        logger.warning(f"Jogador {sid} não registrado na sala {room_id}")
+    if sid not in state.players:
+        logger.warning("Jogador %s não registrado na sala %s", sid, room_id)
         emit("error", {"message": "Você não está registrado como jogador."})
         return
-    if not state["is_bot_game"] and len(state["players"]) < 2:
-        logger.warning(f"Sala {room_id} tem apenas {len(state['players'])} jogador(es)")
+    if not state.is_bot_game and not state.is_full():
+        logger.warning("Sala %s tem apenas %s jogador(es)", room_id, len(state.players))
         emit("error", {"message": "Aguardando o segundo jogador."})
         return
-    if state["game_over"]:
-        logger.warning(f"Sala {room_id}: Jogo encerrado")
+    if state.game_over:
+        logger.warning("Sala %s: Jogo encerrado", room_id)
         emit("error", {"message": "Jogo encerrado! Reinicie para jogar novamente."})
         return
-    if state["players"][sid]["role"] != state["current_player"]:
-        logger.warning(f"Jogador {sid} tentou jogar fora da vez na sala {room_id}")
+    if state.players[sid].role != state.current_player:
+        logger.warning("Jogador %s tentou jogar fora da vez na sala %s", sid, room_id)
         return
 
     row = data["row"]
     col = data["col"]
+    rules = state.rules
+    if not rules.contains(row, col):
+        logger.warning("Jogada inválida (%s, %s) na sala %s", row, col, room_id)
+        return
+    index = rules.cell_index(row, col)
 
-    if state["board"][row][col] == "":
-        state["board"][row][col] = state["current_player"]
-        winner = check_winner(state["board"])
-
-        if winner:
-            state["game_over"] = True
-            state["winner"] = winner
-            if winner != "Draw":
-                for sid, info in state["players"].items():
-                    if info["role"] == winner:
-                        state["scoreboard"][info["name"]] += 1
-                        break
-            else:
-                state["scoreboard"]["Draw"] += 1
-        else:
-            state["current_player"] = "O" if state["current_player"] == "X" else "X"
-
-        logger.debug(f"Sala {room_id}: Jogada em ({row}, {col}) por {state['current_player']}")
-        player_x_name, player_o_name = get_player_names(room_id)
-        emit("update", {
-            "board": state["board"],
-            "current_player": state["current_player"],
-            "winner": state["winner"],
-            "game_over": state["game_over"],
-            "scoreboard": state["scoreboard"],
-            "num_players": len(state["players"]),
-            "player_x_name": player_x_name,
-            "player_o_name": player_o_name
-        }, room=room_id)
-
-        # Se for um jogo contra bot e não houver vencedor, o bot joga
-        if state["is_bot_game"] and not state["game_over"] and state["current_player"] == "O":
-            bot_move = bot_make_move(room_id)
-            if bot_move:
-                row, col = bot_move
-                winner = check_winner(state["board"])
-                if winner:
-                    state["game_over"] = True
-                    state["winner"] = winner
-                    if winner != "Draw":
-                        state["scoreboard"]["Bot"] += 1
-                    else:
-                        state["scoreboard"]["Draw"] += 1
-                else:
-                    state["current_player"] = "X"
-                logger.debug(f"Sala {room_id}: Bot jogou em ({row}, {col})")
-                emit("update", {
-                    "board": state["board"],
-                    "current_player": state["current_player"],
-                    "winner": state["winner"],
-                    "game_over": state["game_over"],
-                    "scoreboard": state["scoreboard"],
-                    "num_players": len(state["players"]),
-                    "player_x_name": player_x_name,
-                    "player_o_name": "Bot"
-                }, room=room_id)
-    else:
+    if not is_free(state.board, index):
+        return
+
+    move = apply_move(room_id, state, index)
+    logger.debug("Sala %s: Jogada em (%s, %s) por %s", room_id, row, col, move["mark"],
+                 extra={"event": "move", "room_id": room_id, "sid": sid, "cell": index, "seq": move["seq"]})
+
+    store.save_room(room_id, state)
+    emit("move", move, room=room_id)
+    spectators.publish(room_id, "move", move)
+
+    # Se for um jogo contra bot e não houver vencedor, o turno do bot vai para o pool
+    if state.is_bot_game and not state.game_over and state.current_player == "O":
+        bot_pool.submit(room_id, state.seq, state.board, state.bot_level, state.size, state.win_length)
+
+@on_event("sync")
+def handle_sync(data):
+    """Reenvia o estado completo para um cliente que detectou falha na sequência."""
+    sid = request.sid
+    room_id = data.get("room_id")
+    state = store.get_room(room_id) if room_id else None
+    if state is None or (sid not in state.players and spectators.room_of(sid) != room_id):
+        logger.warning("Jogador %s pediu sincronização da sala inválida %s", sid, room_id)
+        emit("error", {"message": "Sala inválida."})
         return
+    logger.debug("Sala %s: Sincronização solicitada por %s", room_id, sid)
+    emit("update", state.to_payload(), to=sid)
 
-@socketio.on("reset_game")
+@on_event("reset_game")
+@with_room_lock
 def reset_game(data):
     room_id = data.get("room_id")
-    if room_id not in game_states:
-        logger.error(f"Sala inválida: {room_id}")
+    state = store.get_room(room_id) if room_id else None
+    if state is None:
+        logger.error("Sala inválida: %s", room_id)
         emit("error", {"message": "Sala inválida."})
         return
-    state = game_states[room_id]
-    if not state["is_bot_game"] and len(state["players"]) < 2:
-        logger.warning(f"Sala {room_id}: Apenas {len(state['players'])} jogador(es) para reiniciar")
+    if request.sid not in state.players:
+        logger.warning("Cliente %s não é jogador da sala %s", request.sid, room_id)
+        emit("error", {"message": "Você não está registrado como jogador."})
+        return
+    if not state.is_bot_game and not state.is_full():
+        logger.warning("Sala %s: Apenas %s jogador(es) para reiniciar", room_id, len(state.players))
         emit("error", {"message": "Aguardando o segundo jogador."})
         return
-    state.update({
-        "board": [["" for _ in range(3)] for _ in range(3)],
-        "current_player": "X",
-        "winner": None,
-        "game_over": False
-    })
-    logger.debug(f"Sala {room_id}: Jogo reiniciado")
-    player_x_name, player_o_name = get_player_names(room_id)
-    emit("update", {
-        "board": state["board"],
-        "current_player": state["current_player"],
-        "winner": None,
-        "game_over": False,
-        "scoreboard": state["scoreboard"],
-        "num_players": len(state["players"]),
-        "player_x_name": player_x_name,
-        "player_o_name": player_o_name
-    }, room=room_id)
-
-@socketio.on("reset_scoreboard")
+    state.reset_board()
+    store.save_room(room_id, state)
+    logger.debug("Sala %s: Jogo reiniciado", room_id)
+    payload = state.to_payload()
+    emit("update", payload, room=room_id)
+    spectators.publish(room_id, "update", payload)
+
+@on_event("reset_scoreboard")
+@with_room_lock
 def reset_scoreboard(data):
     room_id = data.get("room_id")
-    if room_id not in game_states:
-        logger.error(f"Sala inválida: {room_id}")
+    state = store.get_room(room_id) if room_id else None
+    if state is None:
+        logger.error("Sala inválida: %s", room_id)
         emit("error", {"message": "Sala inválida."})
         return
-    state = game_states[room_id]
-    if not state["is_bot_game"] and len(state["players"]) < 2:
-        logger.warning(f"Sala {room_id}: Apenas {len(state['players'])} jogador(es) para zerar placar")
+    if request.sid not in state.players:
+        logger.warning("Cliente %s não é jogador da sala %s", request.sid, room_id)
+        emit("error", {"message": "Você não está registrado como jogador."})
+        return
+    if not state.is_bot_game and not state.is_full():
+        logger.warning("Sala %s: Apenas %s jogador(es) para zerar placar", room_id, len(state.players))
         emit("error", {"message": "Aguardando o segundo jogador."})
         return
-    new_scoreboard = {"Draw": 0}
-    for sid, info in state["players"].items():
-        new_scoreboard[info["name"]] = 0
-    state.update({
-        "board": [["" for _ in range(3)] for _ in range(3)],
-        "current_player": "X",
-        "winner": None,
-        "game_over": False,
-        "scoreboard": new_scoreboard
-    })
-    logger.debug(f"Sala {room_id}: Placar zerado")
-    player_x_name, player_o_name = get_player_names(room_id)
-    emit("update", {
-        "board": state["board"],
-        "current_player": state["current_player"],
-        "winner": None,
-        "game_over": False,
-        "scoreboard": state["scoreboard"],
-        "num_players": len(state["players"]),
-        "player_x_name": player_x_name,
-        "player_o_name": player_o_name
-    }, room=room_id)
+    state.reset_scoreboard()
+    store.save_room(room_id, state)
+    logger.debug("Sala %s: Placar zerado", room_id)
+    payload = state.to_payload()
+    emit("update", payload, room=room_id)
+    spectators.publish(room_id, "update", payload)
 
 if __name__ == "__main__":
+    configure_logging(level=os.environ.get("LOG_LEVEL", "DEBUG"))
+    # Com o reloader do debug, este bloco roda no processo que vigia os arquivos e no
+    # filho que serve as conexões; só o filho (WERKZEUG_RUN_MAIN) inicia as tarefas de fundo
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_tasks()
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
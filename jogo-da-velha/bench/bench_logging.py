@@ -0,0 +1,79 @@
+"""Vazão de jogadas com o logging em DEBUG e em INFO.
+
+Uso: python bench/bench_logging.py [--games 2000] [--format json] [--output /tmp/velha.log]
+
+Joga partidas completas contra o bot pelo cliente de teste do Socket.IO, com o
+logging configurado por logs.configure_logging em cada nível, e informa
+jogadas por segundo e o volume de log gravado.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("SERVER_MODE", "threading")
+os.environ.setdefault("BOT_EXECUTOR", "thread")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as server
+from engine import cell_position, empty_cells
+from logs import configure_logging, stop_logging
+
+
+def play_games(games):
+    """Joga as partidas como X, em casas aleatórias; retorna o número de jogadas enviadas."""
+    client = server.socketio.test_client(server.app)
+    moves = 0
+    for _ in range(games):
+        client.emit("start_bot_game", {"player_name": "bench", "difficulty": "hard"})
+        room_id = next(event["args"][0]["room_id"] for event in client.get_received()
+                       if event["name"] == "assign_role")
+        state = server.store.get_room(room_id)
+        while not state.game_over:
+            row, col = cell_position(random.choice(empty_cells(state.board)))
+            client.emit("make_move", {"room_id": room_id, "row": row, "col": col})
+            moves += 1
+            # A resposta do bot chega por uma tarefa de fundo
+            while not state.game_over and state.current_player == "O":
+                time.sleep(0.0001)
+        client.get_received()
+    client.disconnect()
+    return moves
+
+
+def run(level, args):
+    configure_logging(level=level, fmt=args.format, output=args.output)
+    size_before = os.path.getsize(args.output)
+    started = time.perf_counter()
+    moves = play_games(args.games)
+    elapsed = time.perf_counter() - started
+    stop_logging()
+    return {
+        "moves": moves,
+        "seconds": round(elapsed, 3),
+        "moves_per_second": round(moves / elapsed),
+        "log_bytes": os.path.getsize(args.output) - size_before
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--format", choices=("text", "json"), default="json")
+    parser.add_argument("--output", default="velha-bench.log")
+    args = parser.parse_args(argv)
+
+    open(args.output, "w").close()
+    random.seed(1)
+    # Uma rodada de aquecimento para carregar o cache de posições
+    run("INFO", argparse.Namespace(**dict(vars(args), games=min(args.games, 200))))
+    results = {level: run(level, args) for level in ("DEBUG", "INFO")}
+    results["info_speedup"] = round(results["INFO"]["moves_per_second"] / results["DEBUG"]["moves_per_second"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Gerador de carga de conexões: abre N clientes Socket.IO e os mantém conectados.
+
+Uso: python bench/connections.py --url http://127.0.0.1:5000 --clients 2000 [--pid PID_DO_SERVIDOR]
+
+Os clientes rodam em greenlets do gevent, então um único processo consegue
+manter milhares de conexões WebSocket abertas.
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse
+import json
+import time
+
+import gevent
+import gevent.event
+import socketio
+
+
+def rss_kb(pid):
+    """Retorna a memória residente (VmRSS) do processo, em KB."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return None
+
+
+def open_client(url, results):
+    client = socketio.Client(reconnection=False)
+    rooms_received = gevent.event.Event()
+    client.on("update_rooms", lambda data: rooms_received.set())
+    start = time.perf_counter()
+    try:
+        client.connect(url, transports=["websocket"], wait_timeout=30)
+        if not rooms_received.wait(30):
+            raise TimeoutError("sem update_rooms")
+    except Exception as exc:
+        results["failed"] += 1
+        results["errors"][type(exc).__name__] = results["errors"].get(type(exc).__name__, 0) + 1
+        return None
+    results["connect_ms"].append((time.perf_counter() - start) * 1000)
+    return client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=100, help="conexões abertas em paralelo por lote")
+    parser.add_argument("--hold", type=float, default=5.0, help="segundos mantendo as conexões abertas")
+    parser.add_argument("--pid", type=int, help="pid do servidor, para medir a RSS")
+    args = parser.parse_args(argv)
+
+    results = {"failed": 0, "errors": {}, "connect_ms": []}
+    clients = []
+    started = time.perf_counter()
+    for offset in range(0, args.clients, args.batch):
+        jobs = [gevent.spawn(open_client, args.url, results) for _ in range(min(args.batch, args.clients - offset))]
+        gevent.joinall(jobs)
+        clients.extend(job.value for job in jobs if job.value is not None)
+    elapsed = time.perf_counter() - started
+
+    gevent.sleep(args.hold)
+    alive = sum(1 for client in clients if client.connected)
+    latencies = sorted(results["connect_ms"])
+    report = {
+        "requested": args.clients,
+        "connected": len(clients),
+        "alive_after_hold": alive,
+        "failed": results["failed"],
+        "errors": results["errors"],
+        "seconds_to_connect": round(elapsed, 2),
+        "connect_p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+        "connect_p99_ms": round(latencies[int(len(latencies) * 0.99)], 1) if latencies else None,
+        "server_rss_kb": rss_kb(args.pid) if args.pid else None,
+    }
+    print(json.dumps(report, indent=2))
+
+    for client in clients:
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
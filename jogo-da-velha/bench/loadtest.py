@@ -0,0 +1,332 @@
+"""Teste de carga: clientes Socket.IO simulados jogando partidas completas.
+
+Uso: python bench/loadtest.py --scenario bot --clients 1000 [--duration 30] [--size 15] [--out resultado.json]
+
+Sobe o servidor (server.py, modo gevent por padrão) numa porta local, ou usa
+um já em execução com --url, e abre N clientes que falam o protocolo real de
+eventos. Cenários:
+
+    bot         cada cliente joga partidas seguidas contra o bot
+    multiplayer os clientes jogam em pares, reiniciando a partida ao terminar
+    lobby       os clientes criam salas e saem delas sem parar (rotatividade do lobby)
+    disconnect  todos entram em partidas e desconectam ao mesmo tempo; mede o
+                tempo até o servidor liberar as salas
+    spectate    dois clientes jogam e todos os outros assistem à mesma sala;
+                a latência de jogada é a dos jogadores
+
+O relatório (jogadas/s, latência p50/p99 da jogada até o evento "move",
+latência de entrada e RSS do servidor) é impresso e salvo em JSON, com o
+commit atual, para comparar execuções.
+"""
+
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+
+import gevent
+import gevent.queue
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("bot", "multiplayer", "lobby", "disconnect", "spectate")
+
+
+class Stats:
+    def __init__(self):
+        self.moves = 0
+        self.games = 0
+        self.move_ms = []
+        self.join_ms = []
+        self.errors = {}
+
+    def error(self, name):
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)], 2)
+
+
+def rss_kb(pid):
+    """Retorna a memória residente (VmRSS) do processo, em KB."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return None
+
+
+def read_metric(url, name):
+    """Lê o valor de uma métrica sem rótulos em /metrics."""
+    with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+        match = re.search(rf"^{name} (\S+)$", response.read().decode(), re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class SimClient:
+    """Cliente simulado: guarda todos os eventos recebidos numa fila."""
+
+    def __init__(self, url, stats, timeout, size=3):
+        self.stats = stats
+        self.size = size
+        self.timeout = timeout
+        self.events = gevent.queue.Queue()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("*", lambda event, data=None: self.events.put((event, data)))
+        self.sio.connect(url, transports=["websocket"], wait_timeout=self.timeout)
+        self.room_id = None
+        self.role = None
+
+    def wait_for(self, name, predicate=None):
+        """Descarta eventos até chegar ``name`` (que satisfaça ``predicate``) e retorna seus dados."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            event, data = self.events.get(timeout=max(deadline - time.monotonic(), 0))
+            if event == "error":
+                raise RuntimeError(data.get("message"))
+            if event == name and (predicate is None or predicate(data)):
+                return data
+
+    def join(self, event, payload):
+        """Envia start_bot_game ou join_game e espera o papel, medindo a latência."""
+        start = time.perf_counter()
+        self.sio.emit(event, payload)
+        role = self.wait_for("assign_role")
+        self.stats.join_ms.append((time.perf_counter() - start) * 1000)
+        self.room_id, self.role = role["room_id"], role["role"]
+        return role
+
+    def watch(self, room_id):
+        """Entra como espectador e espera o snapshot da sala."""
+        self.sio.emit("watch_game", {"room_id": room_id})
+        self.wait_for("watching")
+
+    def move(self, free):
+        """Joga numa casa livre e espera o evento "move" correspondente; retorna o evento."""
+        cell = random.choice(sorted(free))
+        start = time.perf_counter()
+        self.sio.emit("make_move", {"room_id": self.room_id, "row": cell // self.size, "col": cell % self.size})
+        move = self.wait_for("move", lambda data: data["cell"] == cell)
+        self.stats.move_ms.append((time.perf_counter() - start) * 1000)
+        self.stats.moves += 1
+        free.discard(cell)
+        return move
+
+    def close(self):
+        if self.sio.connected:
+            self.sio.disconnect()
+
+
+def connect(url, stats, timeout, size):
+    try:
+        return SimClient(url, stats, timeout, size)
+    except Exception as exc:
+        stats.error(type(exc).__name__)
+        return None
+
+
+def play_bot(client, board, stop_at):
+    while time.monotonic() < stop_at:
+        client.join("start_bot_game", {"player_name": "carga", "difficulty": random.choice(("easy", "hard")), **board})
+        free = set(range(client.size ** 2))
+        while True:
+            if "winner" in client.move(free):
+                break
+            bot_move = client.wait_for("move", lambda data: data["mark"] == "O")
+            free.discard(bot_move["cell"])
+            if "winner" in bot_move:
+                break
+        client.stats.games += 1
+        client.sio.emit("leave_game", {"room_id": client.room_id})
+        client.wait_for("leave_game_success")
+
+
+def seat_pair(first, second, board):
+    first.join("join_game", {"room_id": "", "create_new": True, "player_name": "carga-x", **board})
+    second.join("join_game", {"room_id": first.room_id, "player_name": "carga-o"})
+
+
+def play_pair(first, second, board, stop_at, seated=False):
+    if not seated:
+        seat_pair(first, second, board)
+    players = {"X": first, "O": second}
+    while time.monotonic() < stop_at:
+        free = set(range(first.size ** 2))
+        mover = "X"
+        while True:
+            move = players[mover].move(free)
+            other = players["O" if mover == "X" else "X"]
+            other.wait_for("move", lambda data, seq=move["seq"]: data["seq"] == seq)
+            if "winner" in move:
+                break
+            mover = "O" if mover == "X" else "X"
+        first.stats.games += 1
+        first.sio.emit("reset_game", {"room_id": first.room_id})
+        for client in players.values():
+            client.wait_for("update", lambda data: data["seq"] > move["seq"])
+
+
+def watch_pair(clients, board, stop_at, extra):
+    first, second, viewers = clients[0], clients[1], clients[2:]
+    seat_pair(first, second, board)
+    jobs = [gevent.spawn(viewer.watch, first.room_id) for viewer in viewers]
+    gevent.joinall(jobs)
+    extra["spectators"] = sum(1 for job in jobs if job.successful())
+    play_pair(first, second, board, stop_at, seated=True)
+
+
+def churn_lobby(client, stop_at):
+    while time.monotonic() < stop_at:
+        client.join("join_game", {"room_id": "", "create_new": True, "player_name": "carga"})
+        client.sio.emit("leave_game", {"room_id": client.room_id})
+        client.wait_for("leave_game_success")
+
+
+def guarded(stats, function, *args):
+    try:
+        function(*args)
+    except Exception as exc:
+        stats.error(type(exc).__name__)
+
+
+def run_scenario(args, url, stats):
+    clients = []
+    for offset in range(0, args.clients, args.batch):
+        jobs = [gevent.spawn(connect, url, stats, args.timeout, args.size) for _ in range(min(args.batch, args.clients - offset))]
+        gevent.joinall(jobs)
+        clients.extend(job.value for job in jobs if job.value is not None)
+
+    board = {"size": args.size, "win_length": args.win_length or min(args.size, 5)}
+    extra = {}
+    started = time.perf_counter()
+    stop_at = time.monotonic() + args.duration
+    if args.scenario == "bot":
+        jobs = [gevent.spawn(guarded, stats, play_bot, client, board, stop_at) for client in clients]
+    elif args.scenario == "multiplayer":
+        jobs = [gevent.spawn(guarded, stats, play_pair, first, second, board, stop_at)
+                for first, second in zip(clients[::2], clients[1::2])]
+    elif args.scenario == "spectate":
+        jobs = [gevent.spawn(guarded, stats, watch_pair, clients, board, stop_at, extra)]
+    elif args.scenario == "lobby":
+        jobs = [gevent.spawn(guarded, stats, churn_lobby, client, stop_at) for client in clients]
+    else:
+        # Todos entram em partidas contra o bot e caem de uma vez
+        jobs = [gevent.spawn(guarded, stats, client.join, "start_bot_game", {"player_name": "carga"})
+                for client in clients]
+    gevent.joinall(jobs)
+
+    if args.scenario == "disconnect":
+        extra["rooms_before"] = read_metric(url, "velha_rooms")
+        storm_started = time.perf_counter()
+        gevent.joinall([gevent.spawn(client.close) for client in clients])
+        while read_metric(url, "velha_rooms") and time.perf_counter() - storm_started < args.timeout:
+            gevent.sleep(0.05)
+        extra["rooms_after"] = read_metric(url, "velha_rooms")
+        extra["seconds_to_release_rooms"] = round(time.perf_counter() - storm_started, 3)
+    elapsed = time.perf_counter() - started
+
+    gevent.joinall([gevent.spawn(client.close) for client in clients])
+    return len(clients), elapsed, extra
+
+
+def start_server(args):
+    port = args.port
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    if args.scenario == "disconnect":
+        # Sem reserva de assento, para medir a liberação das salas (exporte RESUME_GRACE para mudar)
+        env.setdefault("RESUME_GRACE", "0")
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"),
+                               "--mode", args.mode, "--host", "127.0.0.1", "--port", str(port)],
+                              env=env, cwd=ROOT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url + "/metrics", timeout=1).close()
+            return server, url
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("O servidor não respondeu em 30 s")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, default="bot")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--size", type=int, default=3, help="tamanho do tabuleiro nos cenários bot e multiplayer")
+    parser.add_argument("--win-length", type=int, help="marcas em linha para vencer (padrão: min(tamanho, 5))")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos jogando (exceto em disconnect)")
+    parser.add_argument("--batch", type=int, default=100, help="conexões abertas em paralelo por lote")
+    parser.add_argument("--timeout", type=float, default=30.0, help="espera máxima por um evento, em segundos")
+    parser.add_argument("--url", help="servidor já em execução; sem isso, sobe server.py")
+    parser.add_argument("--pid", type=int, help="pid do servidor informado em --url, para medir a RSS")
+    parser.add_argument("--mode", default="gevent", help="modo do server.py iniciado pelo teste")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--out", help="arquivo JSON do relatório (padrão: loadtest-<cenário>.json)")
+    args = parser.parse_args(argv)
+
+    server = None
+    url, pid = args.url, args.pid
+    if not url:
+        server, url = start_server(args)
+        pid = server.pid
+    stats = Stats()
+    try:
+        rss_before = rss_kb(pid) if pid else None
+        connected, elapsed, extra = run_scenario(args, url, stats)
+        rss_after = rss_kb(pid) if pid else None
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "scenario": args.scenario,
+        "commit": git_commit(),
+        "mode": None if args.url else args.mode,
+        "clients": args.clients,
+        "board": f"{args.size}x{args.size}/{args.win_length or min(args.size, 5)}",
+        "connected": connected,
+        "seconds": round(elapsed, 2),
+        "games": stats.games,
+        "moves": stats.moves,
+        "moves_per_second": round(stats.moves / elapsed, 1) if elapsed else None,
+        "move_p50_ms": percentile(stats.move_ms, 0.5),
+        "move_p99_ms": percentile(stats.move_ms, 0.99),
+        "joins": len(stats.join_ms),
+        "join_p50_ms": percentile(stats.join_ms, 0.5),
+        "join_p99_ms": percentile(stats.join_ms, 0.99),
+        "server_rss_kb_before": rss_before,
+        "server_rss_kb_after": rss_after,
+        "errors": stats.errors,
+        **extra
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    with open(args.out or f"loadtest-{args.scenario}.json", "w") as result:
+        result.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Teste de vários processos do servidor compartilhando as salas pelo Redis.
+
+Uso: python bench/multi_worker.py [--workers 2] [--games 10] [--redis-url redis://localhost:6379/15]
+
+Sobe --workers processos do server.py com STATE_BACKEND=redis, cada um na sua
+porta, como atrás de um balanceador com sessões fixas (sticky sessions): cada
+cliente fala sempre com o mesmo processo. Sem --redis-url, usa um servidor
+fakeredis local (TcpFakeServer; o lock das salas roda scripts Lua e precisa
+do pacote lupa). Em cada partida:
+
+    um jogador cria a sala num processo
+    ela aparece na lista de salas dos outros processos (rooms_diff e get_rooms)
+    dois jogadores, em outros processos, disputam a vaga ao mesmo tempo: só um entra
+    um espectador, em outro processo, entra na sala e o criador vê a contagem
+    a partida é jogada até o fim, e cada jogada chega aos dois lados e ao espectador
+    ao sair, o adversário é avisado e a sala some do Redis e do lobby
+
+Sai com código 1 se alguma dessas verificações falhar.
+"""
+
+import argparse
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from store import RedisStore
+
+
+class CheckFailed(Exception):
+    pass
+
+
+class Client:
+    """Cliente Socket.IO preso a um processo do servidor; guarda os eventos recebidos numa fila."""
+
+    def __init__(self, url, timeout):
+        self.timeout = timeout
+        self.events = queue.Queue()
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on("*", lambda event, data=None: self.events.put((event, data)))
+        self.sio.connect(url, transports=["websocket"], wait_timeout=timeout)
+
+    def wait_for(self, *names, predicate=None):
+        """Descarta eventos até chegar um dos ``names`` (que satisfaça ``predicate``); retorna (evento, dados)."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                event, data = self.events.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise CheckFailed(f"nenhum evento {'/'.join(names)} em {self.timeout} s") from None
+            if event in names and (predicate is None or predicate(data)):
+                return event, data
+            if event == "error":
+                raise CheckFailed(f"erro inesperado do servidor: {data.get('message')}")
+
+    def close(self):
+        if self.sio.connected:
+            self.sio.disconnect()
+
+
+def start_redis(url):
+    """Retorna (url, servidor fakeredis ou None): usa o Redis informado ou sobe um fakeredis local."""
+    if url:
+        return url, None
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f"redis://{host}:{port}/0", server
+
+
+def start_workers(args, redis_url, history_dir):
+    workers = []
+    for number in range(args.workers):
+        port = args.port + number
+        env = dict(os.environ, STATE_BACKEND="redis", REDIS_URL=redis_url, BOT_EXECUTOR="thread",
+                   HISTORY_DB=os.path.join(history_dir, f"history-{number}.db"), LOG_LEVEL="WARNING")
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"),
+                                    "--mode", args.mode, "--host", "127.0.0.1", "--port", str(port)],
+                                   env=env, cwd=ROOT)
+        workers.append((process, f"http://127.0.0.1:{port}"))
+    deadline = time.monotonic() + 30
+    for process, url in workers:
+        while True:
+            try:
+                urllib.request.urlopen(url + "/metrics", timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"O servidor em {url} não respondeu")
+                time.sleep(0.2)
+    return workers
+
+
+def play_game(number, urls, store, timeout):
+    """Uma partida com o criador, o lobby e os dois candidatos à vaga em processos diferentes."""
+    worker = lambda offset: urls[(number + offset) % len(urls)]
+    creator = Client(worker(0), timeout)
+    contenders = [Client(worker(1), timeout), Client(worker(2) if len(urls) > 2 else worker(1), timeout)]
+    spectator = Client(worker(1), timeout)
+    clients = [creator, spectator] + contenders
+    try:
+        for client in contenders:
+            client.wait_for("update_rooms")
+
+        creator.sio.emit("join_game", {"room_id": "", "player_name": f"c{number}", "create_new": True})
+        _, role = creator.wait_for("assign_role")
+        room_id = role["room_id"]
+        if role["role"] != "X":
+            raise CheckFailed(f"criador da sala {room_id} recebeu o papel {role['role']}")
+
+        # A sala criada num processo aparece no lobby dos outros: pelo diff e pela lista completa
+        contenders[0].wait_for("rooms_diff", predicate=lambda diff: room_id in diff["added"])
+        contenders[0].sio.emit("get_rooms")
+        _, listing = contenders[0].wait_for("update_rooms")
+        if room_id not in listing["rooms"]:
+            raise CheckFailed(f"sala {room_id} fora da lista de salas de outro processo")
+
+        # Os dois candidatos disputam a última vaga ao mesmo tempo; o lock da sala é o do Redis
+        barrier = threading.Barrier(len(contenders))
+
+        def join(client, name):
+            barrier.wait()
+            client.sio.emit("join_game", {"room_id": room_id, "player_name": name})
+
+        threads = [threading.Thread(target=join, args=(client, f"j{number}{n}"))
+                   for n, client in enumerate(contenders)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Quem perde a disputa recebe um erro ou, como no matchmaking, vai para outra sala
+        outcomes = [client.wait_for("assign_role", "error") for client in contenders]
+        seated = [(client, data) for client, (event, data) in zip(contenders, outcomes)
+                  if event == "assign_role" and data["room_id"] == room_id]
+        if len(seated) != 1:
+            raise CheckFailed(f"{len(seated)} jogadores entraram na vaga única da sala {room_id}")
+        joiner, joined = seated[0]
+        if joined["role"] != "O":
+            raise CheckFailed(f"segundo jogador recebeu o papel {joined['role']} na sala {room_id}")
+        creator.wait_for("game_start")
+
+        # Espectador noutro processo: a contagem é a do store, e os eventos chegam pela fila
+        spectator.sio.emit("watch_game", {"room_id": room_id})
+        spectator.wait_for("watching")
+        creator.wait_for("viewers", predicate=lambda count: count["room_id"] == room_id and count["viewers"] == 1)
+
+        # Jogadas alternadas, cada uma enviada a um processo e conferida nos dois
+        free = set(range(9))
+        players = {"X": creator, "O": joiner}
+        mark = "X"
+        while True:
+            cell = random.choice(sorted(free))
+            players[mark].sio.emit("make_move", {"room_id": room_id, "row": cell // 3, "col": cell % 3})
+            moves = [client.wait_for("move", predicate=lambda move: move["cell"] == cell)[1]
+                     for client in (creator, joiner)]
+            if moves[0] != moves[1] or moves[0]["mark"] != mark:
+                raise CheckFailed(f"sala {room_id}: eventos de jogada divergentes {moves}")
+            free.discard(cell)
+            if "winner" in moves[0]:
+                break
+            mark = "O" if mark == "X" else "X"
+        state = store.get_room(room_id)
+        if state is None or not state.game_over or len(state.moves) != moves[0]["seq"]:
+            raise CheckFailed(f"sala {room_id}: estado no Redis não confere com a partida")
+        watched = []
+        while len(watched) < len(state.moves):
+            _, batch = spectator.wait_for("spectate")
+            watched += [data["cell"] for event, data in batch["events"] if event == "move"]
+        if watched != state.moves:
+            raise CheckFailed(f"sala {room_id}: espectador viu {watched}, jogadas {state.moves}")
+
+        joiner.sio.emit("leave_game", {"room_id": room_id})
+        joiner.wait_for("leave_game_success")
+        creator.wait_for("player_left")
+        creator.sio.emit("leave_game", {"room_id": room_id})
+        creator.wait_for("leave_game_success")
+        spectator.wait_for("watch_ended")
+        if store.get_room(room_id) is not None or store.is_open(room_id) or store.viewer_count(room_id):
+            raise CheckFailed(f"sala {room_id} continua no Redis depois que todos saíram")
+    finally:
+        for client in clients:
+            client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2, help="processos do servidor (pelo menos 2)")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--redis-url", help="Redis compartilhado pelos processos; sem isso, sobe um fakeredis")
+    parser.add_argument("--mode", default="gevent", help="modo do server.py")
+    parser.add_argument("--port", type=int, default=5070, help="porta do primeiro processo (as demais seguem)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="espera máxima por um evento, em segundos")
+    args = parser.parse_args(argv)
+    if args.workers < 2:
+        parser.error("--workers deve ser pelo menos 2")
+
+    redis_url, redis_server = start_redis(args.redis_url)
+    store = RedisStore(redis_url)
+    if redis_server is None and store.room_count():
+        parser.error(f"o Redis em {redis_url} já tem salas; use um banco vazio")
+    errors = []
+    with tempfile.TemporaryDirectory() as history_dir:
+        workers = start_workers(args, redis_url, history_dir)
+        try:
+            urls = [url for _, url in workers]
+            for number in range(args.games):
+                try:
+                    play_game(number, urls, store, args.timeout)
+                except CheckFailed as error:
+                    errors.append(f"partida {number}: {error}")
+        finally:
+            for process, _ in workers:
+                process.terminate()
+            for process, _ in workers:
+                process.wait()
+            if redis_server is not None:
+                redis_server.shutdown()
+
+    if errors:
+        print("\n".join(errors[:20]))
+        print(f"FALHOU: {len(errors)} de {args.games} partidas")
+        return 1
+    print(f"OK: {args.games} partidas entre {args.workers} processos compartilhando as salas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
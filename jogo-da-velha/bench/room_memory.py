@@ -0,0 +1,93 @@
+"""Memória por sala e custo do reinício: dicionários aninhados contra objetos Room.
+
+Uso: python bench/room_memory.py [--rooms 100000]
+
+Cria N salas multiplayer com dois jogadores em cada formato e mede, com
+tracemalloc, a memória alocada por sala. Em seguida mede o tempo de reiniciar
+o tabuleiro de uma sala (nova partida) em cada formato.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import new_board
+from room import Room
+
+
+def dict_room(n):
+    """Sala no formato anterior: dicionários com o estado e os jogadores."""
+    x_name, o_name = f"x{n}", f"o{n}"
+    return {
+        "board": new_board(),
+        "current_player": "X",
+        "winner": None,
+        "game_over": False,
+        "scoreboard": {"Draw": 0, x_name: 0, o_name: 0},
+        "players": {
+            f"sx{n}": {"role": "X", "name": x_name},
+            f"so{n}": {"role": "O", "name": o_name}
+        },
+        "is_bot_game": False,
+        "seq": 0
+    }
+
+
+def slotted_room(n):
+    room = Room()
+    room.add_player(f"sx{n}", "X", f"x{n}")
+    room.add_player(f"so{n}", "O", f"o{n}")
+    return room
+
+
+def reset_dict(state):
+    state.update({
+        "board": new_board(),
+        "current_player": "X",
+        "winner": None,
+        "game_over": False,
+        "seq": state["seq"] + 1
+    })
+
+
+def bytes_per_room(factory, rooms):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [factory(n) for n in range(rooms)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Os sids e nomes são os mesmos nos dois formatos; a diferença é a estrutura da sala
+    del kept
+    return (after - before) / rooms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    dict_bytes = bytes_per_room(dict_room, args.rooms)
+    slotted_bytes = bytes_per_room(slotted_room, args.rooms)
+
+    state, room = dict_room(0), slotted_room(0)
+    number = 200000
+    dict_reset_us = timeit.timeit(lambda: reset_dict(state), number=number) / number * 1e6
+    slotted_reset_us = timeit.timeit(room.reset_board, number=number) / number * 1e6
+
+    print(json.dumps({
+        "rooms": args.rooms,
+        "dict_bytes_per_room": round(dict_bytes),
+        "room_bytes_per_room": round(slotted_bytes),
+        "memory_saved": f"{1 - slotted_bytes / dict_bytes:.0%}",
+        "dict_reset_us": round(dict_reset_us, 3),
+        "room_reset_us": round(slotted_reset_us, 3)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Teste de estresse de concorrência: entradas e jogadas simultâneas nas mesmas salas.
+
+Uso: python bench/stress_rooms.py [--rounds 200] [--joiners 8] [--movers 6]
+
+Roda os handlers do app em threads reais (SERVER_MODE=threading) com um
+intervalo de troca do GIL muito curto, para forçar intercalações, e confere
+as invariantes das salas ao final de cada rodada. Sai com código 1 se alguma
+invariante for violada.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+
+os.environ.setdefault("SERVER_MODE", "threading")
+# Assentos de quem desconectou ficam reservados até o fim do teste: uma expiração
+# no meio da conferência alteraria as salas enquanto elas são percorridas
+os.environ.setdefault("RESUME_GRACE", "3600")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+
+logging.disable(logging.CRITICAL)
+
+import app as server
+from engine import CLASSIC, SIZE
+
+
+def run_parallel(functions):
+    """Executa as funções ao mesmo tempo, liberadas juntas por uma barreira."""
+    barrier = threading.Barrier(len(functions))
+
+    def runner(function):
+        barrier.wait()
+        function()
+
+    threads = [threading.Thread(target=runner, args=(function,)) for function in functions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def check_room(room_id, state, errors):
+    x_bits, o_bits = state.board
+    x_count, o_count = bin(x_bits).count("1"), bin(o_bits).count("1")
+    if x_bits & o_bits:
+        errors.append(f"{room_id}: casa marcada pelos dois jogadores")
+    if x_count - o_count not in (0, 1):
+        errors.append(f"{room_id}: ordem de turnos quebrada (X={x_count}, O={o_count})")
+    if (state.size, state.win_length) == (SIZE, SIZE) and state.rules is not CLASSIC:
+        errors.append(f"{room_id}: sala 3x3 sem as regras CLASSIC (o bot não usaria a tabela do solver)")
+    if len(state.players) > 2:
+        errors.append(f"{room_id}: {len(state.players)} jogadores")
+    if state.game_over != (state.rules.check_winner(state.board) is not None):
+        errors.append(f"{room_id}: game_over={state.game_over} não confere com o tabuleiro")
+    if not state.game_over and state.current_player != ("X" if x_count == o_count else "O"):
+        errors.append(f"{room_id}: current_player={state.current_player} não confere com o tabuleiro")
+
+
+def check_store(errors):
+    store = server.store
+    rooms = store._rooms
+    expected_open = {room_id for room_id, state in rooms.items()
+                     if not state.is_bot_game and len(state.players) < 2
+                     and any(player.away_since is None for player in state.players.values())}
+    if expected_open != set(store.list_open_rooms()):
+        errors.append("índice de salas abertas diverge das salas")
+    # Assentos reservados para quem desconectou (RESUME_GRACE) não têm sessão
+    seated = sum(1 for state in rooms.values() for sid, player in state.players.items()
+                 if sid != "bot" and player.away_since is None)
+    if seated != store.session_count():
+        errors.append(f"{seated} jogadores sentados, mas {store.session_count()} sessões")
+    for room_id, state in rooms.items():
+        check_room(room_id, state, errors)
+
+
+def race_joins(joiners):
+    """Vários clientes disputam as mesmas salas abertas pelo matchmaking."""
+    clients = [server.socketio.test_client(server.app) for _ in range(joiners)]
+    run_parallel([
+        lambda client=client, n=n: client.emit("join_game", {"room_id": "", "player_name": f"j{n}"})
+        for n, client in enumerate(clients)
+    ])
+    return clients
+
+
+def race_moves(pairs, movers):
+    """Cada jogador dispara várias jogadas ao mesmo tempo, em casas aleatórias."""
+    functions = []
+    for room_id, players in pairs.items():
+        for client in players:
+            for _ in range(movers):
+                row, col = random.randrange(3), random.randrange(3)
+                functions.append(lambda client=client, room_id=room_id, row=row, col=col:
+                                 client.emit("make_move", {"room_id": room_id, "row": row, "col": col}))
+    random.shuffle(functions)
+    run_parallel(functions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--joiners", type=int, default=8, help="clientes entrando ao mesmo tempo por rodada")
+    parser.add_argument("--movers", type=int, default=6, help="jogadas simultâneas por jogador e rodada")
+    args = parser.parse_args(argv)
+
+    sys.setswitchinterval(1e-6)
+    errors = []
+    for round_number in range(args.rounds):
+        clients = race_joins(args.joiners)
+
+        pairs = {}
+        for client in clients:
+            roles = [event["args"][0] for event in client.get_received() if event["name"] == "assign_role"]
+            if len(roles) != 1:
+                errors.append(f"rodada {round_number}: cliente recebeu {len(roles)} assign_role")
+                continue
+            pairs.setdefault(roles[0]["room_id"], []).append(client)
+        for _ in range(5):
+            race_moves({room_id: players for room_id, players in pairs.items() if len(players) == 2},
+                       args.movers)
+        check_store(errors)
+
+        # Metade sai pelo botão, metade desconecta, ao mesmo tempo
+        run_parallel([
+            (lambda client=client, room_id=room_id: client.emit("leave_game", {"room_id": room_id}))
+            if random.random() < 0.5 else client.disconnect
+            for room_id, players in pairs.items() for client in players
+        ])
+        check_store(errors)
+        if errors:
+            break
+
+    if errors:
+        print("\n".join(errors[:20]))
+        print(f"FALHOU: {len(errors)} violações")
+        return 1
+    print(f"OK: {args.rounds} rodadas sem violações; salas restantes: {server.store.room_count()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
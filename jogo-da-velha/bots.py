@@ -0,0 +1,274 @@
+"""Jogadas do bot, calculadas fora dos handlers do Socket.IO.
+
+As funções de decisão (``choose_move`` e ``cheap_move``) recebem apenas o
+tabuleiro e o nível, sem acesso às salas, e podem rodar em outro processo.
+``BotPool`` enfileira os turnos do bot, manda-os em lotes para um pool de
+processos ou threads e entrega cada resultado de volta ao app assim que chega.
+Se o pool não responder dentro do tempo de pensamento, o turno é resolvido
+com ``cheap_move``.
+
+No tabuleiro clássico o nível difícil consulta a tabela do ``solver``; nos
+tabuleiros maiores (N×N, K em linha) ele faz uma busca alfa-beta limitada pelo
+tempo de pensamento (``search``).
+
+No tabuleiro clássico, as jogadas candidatas do nível fácil ficam num cache
+de posições canônicas (módulo as 8 simetrias); a tabela do solver já é uma
+consulta direta e não passa pelo cache.
+
+Este módulo não importa o app: os processos do pool carregam só o motor, o
+solver e o cache de posições.
+"""
+
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from engine import CELLS, CLASSIC, INVERSE_SYMMETRIES, SIZE, SYMMETRIES, canonical, rules_for, wins_with
+from search import AlphaBetaBot
+from solver import lookup
+from cache import PositionCache
+
+logger = logging.getLogger(__name__)
+
+# Candidatas do nível fácil por posição canônica do 3×3 e jogador da vez, um cache por processo
+position_cache = PositionCache(int(os.environ.get("POSITION_CACHE_SIZE", 4096)))
+
+# Turno pendente do bot; seq identifica a jogada do humano que o originou
+BotTurn = namedtuple("BotTurn", "room_id seq board level size win_length submitted")
+
+
+def analyze_position(board):
+    """Retorna (valor, jogadas ótimas) para o jogador da vez, ou None se a posição não é alcançável."""
+    result = lookup(board)
+    if result is None:
+        return None
+    value, moves = result
+    return value, [i for i in range(CELLS) if moves >> i & 1]
+
+
+def cheap_moves(board, rules=CLASSIC, slot=1):
+    """Jogadas candidatas do nível fácil para o jogador ``slot`` (1 = O, o bot no servidor)."""
+    if rules is not CLASSIC:
+        return _cheap_moves(board, rules, slot)
+    # Posições simétricas têm as mesmas candidatas, a menos da simetria
+    key, symmetry = canonical(board)
+    key = key << 1 | slot
+    moves = position_cache.get(key)
+    if moves is None:
+        table = SYMMETRIES[symmetry]
+        moves = tuple(table[i] for i in _cheap_moves(board, rules, slot))
+        position_cache.put(key, moves)
+    inverse = INVERSE_SYMMETRIES[symmetry]
+    return [inverse[i] for i in moves]
+
+
+def _cheap_moves(board, rules, slot):
+    own, other = board[slot], board[1 - slot]
+    free = rules.empty_cells(board)
+    wins = wins_with if rules is CLASSIC else rules.wins_at
+
+    # 1. Jogar para vencer
+    for index in free:
+        if wins(own, index):
+            return [index]
+
+    # 2. Bloquear vitória do adversário
+    for index in free:
+        if wins(other, index):
+            return [index]
+
+    # 3. Jogar aleatoriamente (nos tabuleiros grandes, perto das marcas)
+    if rules is not CLASSIC:
+        near = rules.neighbors(own | other)
+        if near:
+            free = [index for index in free if near >> index & 1]
+    return free
+
+
+def cheap_move(board, rules=CLASSIC, slot=1):
+    """Heurística do nível fácil: vencer, senão bloquear, senão jogar ao acaso."""
+    moves = cheap_moves(board, rules, slot)
+    if moves:
+        return random.choice(moves)
+    return None
+
+
+def choose_move(board, level, size=SIZE, win_length=SIZE, budget=0.1, slot=1):
+    """Escolhe a casa em que o bot (``slot``, O por padrão) vai jogar, sem alterar o tabuleiro."""
+    rules = rules_for(size, win_length)
+    if level == "hard":
+        if rules is CLASSIC:
+            # Uma consulta à tabela do solver
+            analysis = analyze_position(board)
+            if analysis and analysis[1]:
+                return random.choice(analysis[1])
+        else:
+            return AlphaBetaBot(rules).choose(board, slot, budget)
+    return cheap_move(board, rules, slot)
+
+
+def choose_moves(batch, budget=0.1):
+    """Resolve um lote de turnos [(tabuleiro, nível, tamanho, K), ...] de uma vez; roda no pool.
+
+    As buscas alfa-beta do lote dividem ``budget`` segundos entre si. Retorna
+    (jogadas, (pid, acertos, faltas, despejos)), com os contadores acumulados do
+    cache de posições do processo que resolveu o lote.
+    """
+    searches = sum(1 for _, level, size, win_length in batch if level == "hard" and (size, win_length) != (SIZE, SIZE))
+    share = budget / max(searches, 1)
+    moves = [choose_move(board, level, size, win_length, share) for board, level, size, win_length in batch]
+    return moves, (os.getpid(), position_cache.hits, position_cache.misses, position_cache.evictions)
+
+
+def _watch_parent(parent_pid):
+    """Encerra o processo do pool se o servidor morrer sem desligá-lo (SIGTERM, SIGKILL)."""
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class BotPool:
+    """Fila de turnos do bot processada em lotes por um pool de processos ou threads.
+
+    ``on_result(turn, index, fallback)`` é chamado numa tarefa de fundo do
+    Socket.IO para cada turno, com ``fallback`` verdadeiro quando a jogada veio
+    de ``cheap_move`` porque o pool estourou o tempo ou falhou.
+
+    Nos modos gevent e eventlet as threads do pool viram greenlets e não tiram
+    o cálculo do loop de eventos; nesses modos use ``executor="process"``.
+    """
+
+    def __init__(self, socketio, on_result, executor="process", workers=None,
+                 think_time=0.2, batch_size=64, poll_interval=0.001):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Executor do bot desconhecido: {executor}")
+        self.socketio = socketio
+        self.on_result = on_result
+        self.executor_kind = executor
+        self.workers = workers or os.cpu_count() or 1
+        self.think_time = think_time
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._executor = None
+        self._pending = []
+        self._running = False
+        self._lock = threading.Lock()
+        # Contadores do cache de posições de cada processo do pool: pid -> (acertos, faltas, despejos)
+        self._cache_counts = {}
+
+    def start(self):
+        """Cria o pool e aquece os processos, para o primeiro turno não pagar a inicialização."""
+        if self._executor is None:
+            if self.executor_kind == "process":
+                # spawn: os filhos não herdam locks, threads nem o monkey patching do servidor
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_watch_parent, initargs=(os.getpid(),))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="bot")
+            for _ in range(self.workers):
+                self._executor.submit(choose_moves, [])
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, room_id, seq, board, level, size=SIZE, win_length=SIZE):
+        """Enfileira um turno do bot; o resultado chega depois por ``on_result``."""
+        turn = BotTurn(room_id, seq, list(board), level, size, win_length, time.perf_counter())
+        with self._lock:
+            self._pending.append(turn)
+            if self._running:
+                return
+            self._running = True
+        self.socketio.start_background_task(self._run)
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def cache_hits(self):
+        """Acertos do cache de posições, somados entre os processos do pool."""
+        return sum(counts[0] for counts in list(self._cache_counts.values()))
+
+    def cache_misses(self):
+        return sum(counts[1] for counts in list(self._cache_counts.values()))
+
+    def cache_evictions(self):
+        return sum(counts[2] for counts in list(self._cache_counts.values()))
+
+    def _run(self):
+        try:
+            self._drain()
+        except Exception:
+            logger.exception("Falha no processamento dos turnos do bot")
+            with self._lock:
+                self._running = False
+
+    def _drain(self):
+        executor = self.start()
+        while True:
+            with self._lock:
+                turns, self._pending = self._pending, []
+                if not turns:
+                    self._running = False
+                    return
+            deadline = time.perf_counter() + self.think_time
+            # A busca usa parte do tempo de pensamento; o resto cobre a fila e a ida e volta ao pool
+            budget = self.think_time / 2
+            # Reparte os turnos entre todos os processos do pool (lotes de até batch_size)
+            size = min(self.batch_size, -(-len(turns) // self.workers))
+            batches = []
+            for offset in range(0, len(turns), size):
+                batch = turns[offset:offset + size]
+                future = executor.submit(choose_moves, [(turn.board, turn.level, turn.size, turn.win_length)
+                                                        for turn in batch], budget)
+                batches.append((batch, future))
+            self._collect(batches, deadline)
+
+    def _collect(self, batches, deadline):
+        # Espera cedendo a vez ao loop de eventos, aplicando cada lote assim que fica pronto
+        while batches:
+            waiting = []
+            for batch, future in batches:
+                if future.done():
+                    self._deliver(batch, future)
+                elif time.perf_counter() >= deadline:
+                    future.cancel()
+                    self._fallback(batch)
+                else:
+                    waiting.append((batch, future))
+            batches = waiting
+            if batches:
+                self.socketio.sleep(self.poll_interval)
+
+    def _deliver(self, batch, future):
+        try:
+            moves, (pid, *counts) = future.result()
+        except Exception:
+            self._fallback(batch)
+            return
+        # Os lotes podem chegar fora de ordem; os contadores de cada processo só crescem
+        previous = self._cache_counts.get(pid, (0, 0, 0))
+        self._cache_counts[pid] = tuple(map(max, previous, counts))
+        for turn, index in zip(batch, moves):
+            self._apply(turn, index, False)
+
+    def _fallback(self, batch):
+        logger.warning("Pool do bot sem resposta em %s s; %s turno(s) com jogada simples", self.think_time, len(batch))
+        for turn in batch:
+            self._apply(turn, cheap_move(turn.board, rules_for(turn.size, turn.win_length)), True)
+
+    def _apply(self, turn, index, fallback):
+        try:
+            self.on_result(turn, index, fallback)
+        except Exception:
+            logger.exception("Falha ao aplicar a jogada do bot na sala %s", turn.room_id)
@@ -0,0 +1,54 @@
+"""Cache LRU de posições compartilhado por todas as salas."""
+
+import threading
+from collections import OrderedDict
+
+
+class PositionCache:
+    """Cache LRU com limite de tamanho e contadores de acertos, faltas e despejos.
+
+    As chaves devem ser posições já canonicalizadas (ver ``engine.canonical``),
+    de forma que salas com posições simétricas compartilhem a mesma entrada.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o valor guardado ou None, atualizando a ordem de uso."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Guarda o valor, despejando a entrada menos usada se necessário."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        """Retorna os contadores do cache."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
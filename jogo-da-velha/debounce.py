@@ -0,0 +1,41 @@
+"""Agrupamento de trabalho em janelas de tempo, com uma tarefa de fundo por janela."""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Debouncer:
+    """Chama ``flush`` uma vez por janela de ``interval`` segundos, numa tarefa de fundo do Socket.IO.
+
+    Quem acumula trabalho chama ``schedule`` a cada item; só a primeira chamada
+    da janela inicia a tarefa. A marca de agendamento é desfeita antes de
+    ``flush``, então um item chegado durante o envio abre a próxima janela em
+    vez de se perder, e uma exceção em ``flush`` (registrada no log) não
+    impede as janelas seguintes.
+    """
+
+    def __init__(self, socketio, interval, flush, name):
+        self.socketio = socketio
+        self.interval = interval
+        self.flush = flush
+        self.name = name
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        self.socketio.sleep(self.interval)
+        with self._lock:
+            self._scheduled = False
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Falha ao processar a janela de %s", self.name)
@@ -0,0 +1,251 @@
+"""Motor do jogo da velha baseado em bitboards.
+
+Cada tabuleiro é uma lista ``[x, o]`` com dois inteiros de 9 bits, um por
+jogador. A casa ``(linha, coluna)`` corresponde ao bit ``linha * 3 + coluna``.
+
+As funções do módulo tratam do tabuleiro clássico 3×3; ``Rules`` generaliza
+para N×N com K em linha (por exemplo, 15×15 com cinco em linha).
+"""
+
+from functools import lru_cache
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL = (1 << CELLS) - 1
+
+# Índice de cada jogador dentro do tabuleiro [x, o]
+SLOT = {"X": 0, "O": 1}
+
+# Máscaras de todas as linhas vencedoras (3 linhas, 3 colunas, 2 diagonais)
+LINES = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+# Para cada casa, apenas as linhas que passam por ela
+CELL_LINES = tuple(
+    tuple(line for line in LINES if line >> cell & 1) for cell in range(CELLS)
+)
+
+
+def new_board():
+    """Retorna um tabuleiro vazio."""
+    return [0, 0]
+
+
+def cell_index(row, col):
+    """Converte (linha, coluna) para o índice do bit."""
+    return row * SIZE + col
+
+
+def cell_position(index):
+    """Converte o índice do bit para (linha, coluna)."""
+    return divmod(index, SIZE)
+
+
+def occupied(board):
+    """Retorna a máscara das casas ocupadas."""
+    return board[0] | board[1]
+
+
+def is_free(board, index):
+    """Indica se a casa está livre."""
+    return not (occupied(board) >> index) & 1
+
+
+def play(board, player, index):
+    """Marca a casa para o jogador e retorna o delta (bit) da jogada."""
+    delta = 1 << index
+    board[SLOT[player]] |= delta
+    return delta
+
+
+def empty_cells(board):
+    """Retorna os índices das casas livres."""
+    free = ~occupied(board) & FULL
+    return [i for i in range(CELLS) if free >> i & 1]
+
+
+def wins_with(bits, index):
+    """Indica se marcar a casa completa alguma linha para esses bits."""
+    bits |= 1 << index
+    return any(bits & line == line for line in CELL_LINES[index])
+
+
+def check_winner(board, last=None):
+    """Retorna "X", "O", "Draw" ou None.
+
+    Quando ``last`` (índice da última jogada) é informado, apenas as linhas
+    que passam por essa casa são verificadas.
+    """
+    if last is not None:
+        player = "X" if board[0] >> last & 1 else "O"
+        bits = board[SLOT[player]]
+        for line in CELL_LINES[last]:
+            if bits & line == line:
+                return player
+    else:
+        for player, bits in (("X", board[0]), ("O", board[1])):
+            for line in LINES:
+                if bits & line == line:
+                    return player
+    if occupied(board) == FULL:
+        return "Draw"
+    return None
+
+
+def to_rows(board):
+    """Converte o tabuleiro para o formato de listas enviado ao cliente."""
+    x, o = board
+    return [
+        ["X" if x >> i & 1 else "O" if o >> i & 1 else "" for i in range(r * SIZE, (r + 1) * SIZE)]
+        for r in range(SIZE)
+    ]
+
+
+def _transform(cell, symmetry):
+    """Aplica uma das 8 simetrias do quadrado à casa (4 rotações, com ou sem reflexão)."""
+    row, col = cell_position(cell)
+    if symmetry & 4:
+        col = SIZE - 1 - col
+    for _ in range(symmetry & 3):
+        row, col = col, SIZE - 1 - row
+    return cell_index(row, col)
+
+
+# Permutação das casas para cada simetria e a sua inversa
+SYMMETRIES = tuple(tuple(_transform(cell, s) for cell in range(CELLS)) for s in range(8))
+INVERSE_SYMMETRIES = tuple(
+    tuple(perm.index(cell) for cell in range(CELLS)) for perm in SYMMETRIES
+)
+
+# Imagem de cada máscara de 9 bits sob cada simetria
+_SYMMETRY_BITS = tuple(
+    tuple(sum(1 << perm[i] for i in range(CELLS) if bits >> i & 1) for bits in range(FULL + 1))
+    for perm in SYMMETRIES
+)
+
+
+def canonical(board):
+    """Retorna (forma canônica, simetria aplicada) do tabuleiro.
+
+    A forma canônica é o menor ``x | o << 9`` entre as 8 simetrias; a casa
+    ``c`` do tabuleiro original corresponde a ``SYMMETRIES[simetria][c]``.
+    """
+    x, o = board
+    best_key = None
+    best_symmetry = 0
+    for symmetry, table in enumerate(_SYMMETRY_BITS):
+        key = table[x] | table[o] << CELLS
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+def from_key(key):
+    """Converte a chave ``x | o << 9`` de volta para um tabuleiro."""
+    return [key & FULL, key >> CELLS]
+
+
+# Direções das linhas: horizontal, vertical e as duas diagonais
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+class Rules:
+    """Tabuleiro N×N em que vence quem alinhar ``win_length`` marcas seguidas.
+
+    Usa a mesma representação ``[x, o]`` do jogo clássico, com N² bits por
+    jogador. A vitória é verificada a partir da última jogada, percorrendo no
+    máximo ``win_length - 1`` casas em cada sentido das 4 direções.
+    """
+
+    __slots__ = ("size", "win_length", "cells", "full")
+
+    def __init__(self, size=SIZE, win_length=SIZE):
+        if not 3 <= win_length <= size:
+            raise ValueError(f"Comprimento de vitória inválido para {size}x{size}: {win_length}")
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+
+    def cell_index(self, row, col):
+        return row * self.size + col
+
+    def cell_position(self, index):
+        return divmod(index, self.size)
+
+    def contains(self, row, col):
+        return 0 <= row < self.size and 0 <= col < self.size
+
+    def empty_cells(self, board):
+        free = ~occupied(board) & self.full
+        return [i for i in range(self.cells) if free >> i & 1]
+
+    def run_length(self, bits, index, d_row, d_col):
+        """Conta as marcas seguidas de ``bits`` a partir de ``index`` (exclusive) numa direção."""
+        size = self.size
+        row, col = divmod(index, size)
+        count = 0
+        for _ in range(self.win_length - 1):
+            row += d_row
+            col += d_col
+            if not (0 <= row < size and 0 <= col < size) or not bits >> (row * size + col) & 1:
+                break
+            count += 1
+        return count
+
+    def wins_at(self, bits, index):
+        """Indica se ``bits``, com a casa ``index`` marcada, têm ``win_length`` marcas em linha por ela."""
+        bits |= 1 << index
+        for d_row, d_col in DIRECTIONS:
+            total = 1 + self.run_length(bits, index, d_row, d_col) + self.run_length(bits, index, -d_row, -d_col)
+            if total >= self.win_length:
+                return True
+        return False
+
+    def check_winner(self, board, last=None):
+        """Retorna "X", "O", "Draw" ou None; com ``last``, verifica só a última jogada em O(K)."""
+        if last is not None:
+            player = "X" if board[0] >> last & 1 else "O"
+            if self.wins_at(board[SLOT[player]], last):
+                return player
+        else:
+            for player, bits in (("X", board[0]), ("O", board[1])):
+                if any(bits >> i & 1 and self.wins_at(bits, i) for i in range(self.cells)):
+                    return player
+        if occupied(board) == self.full:
+            return "Draw"
+        return None
+
+    def to_rows(self, board):
+        """Converte o tabuleiro para o formato de listas enviado ao cliente."""
+        x, o = board
+        size = self.size
+        return [
+            ["X" if x >> i & 1 else "O" if o >> i & 1 else "" for i in range(r * size, (r + 1) * size)]
+            for r in range(size)
+        ]
+
+    def neighbors(self, bits, radius=1):
+        """Máscara das casas livres a até ``radius`` casas (inclusive diagonais) de alguma marca."""
+        size = self.size
+        # Colunas que podem receber um deslocamento para a direita/esquerda sem dar a volta na linha
+        not_last_col = sum(((1 << size - 1) - 1) << r * size for r in range(size))
+        not_first_col = not_last_col << 1
+        area = bits
+        for _ in range(radius):
+            horizontal = area | (area & not_last_col) << 1 | (area & not_first_col) >> 1
+            area = horizontal | horizontal << size | horizontal >> size
+        return area & self.full & ~bits
+
+
+@lru_cache(maxsize=None)
+def rules_for(size=SIZE, win_length=SIZE):
+    """Retorna as regras (compartilhadas) de um tamanho de tabuleiro."""
+    return Rules(size, win_length)
+
+
+# Argumentos explícitos: o lru_cache trata rules_for() e rules_for(3, 3) como chaves diferentes
+CLASSIC = rules_for(SIZE, SIZE)
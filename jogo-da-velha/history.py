@@ -0,0 +1,201 @@
+"""Histórico das partidas encerradas, guardado em SQLite.
+
+As partidas são só acrescentadas (nunca alteradas) na tabela ``matches``, com
+a sequência de jogadas compactada em 2 bytes por casa. Os totais de cada
+jogador ficam em ``players``, atualizados na mesma transação, com índice para
+o ranking. ``record`` apenas enfileira a partida; a cada ``interval`` segundos
+a fila inteira é gravada numa única transação, fora do caminho das jogadas. O
+banco usa WAL, para as consultas não esperarem pelas gravações.
+
+Todo acesso ao banco roda em threads do sistema operacional (``NativeWorker``),
+uma para as gravações (e os checkpoints do WAL) e outra, com a sua própria
+conexão, para as consultas: nos modos gevent e eventlet, uma chamada ao SQLite
+num greenlet pararia o servidor inteiro.
+"""
+
+import logging
+import sqlite3
+import time
+from array import array
+
+from debounce import Debouncer
+from native import NativeWorker, original
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    win_length INTEGER NOT NULL,
+    player_x TEXT,
+    player_o TEXT,
+    winner TEXT NOT NULL,
+    moves BLOB NOT NULL,
+    bot_level TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS matches_player_x ON matches (player_x, finished_at);
+CREATE INDEX IF NOT EXISTS matches_player_o ON matches (player_o, finished_at);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS players_ranking ON players (wins DESC, losses);
+"""
+
+_UPSERT = {
+    result: f"INSERT INTO players (name, {result}) VALUES (?, 1) "
+            f"ON CONFLICT (name) DO UPDATE SET {result} = {result} + 1"
+    for result in ("wins", "losses", "draws")
+}
+
+
+def encode_moves(moves):
+    return array("H", moves).tobytes()
+
+
+def decode_moves(blob):
+    moves = array("H")
+    moves.frombytes(blob)
+    return moves.tolist()
+
+
+class MatchHistory:
+    """Fila de partidas encerradas gravada em lotes no SQLite.
+
+    ``record`` recebe um dicionário com room_id, size, win_length, player_x,
+    player_o, winner ("X", "O" ou "Draw"), moves, bot_level e started_at. Nas
+    partidas contra o bot, o assento do bot (``bot_level`` preenchido, jogador
+    O) não entra nos totais.
+    """
+
+    def __init__(self, socketio, path, interval=1.0):
+        self.path = path
+        self.recorded = 0
+        self._pending = []
+        # Usado pelos handlers e pela thread do banco
+        self._lock = original("_thread", "allocate_lock")()
+        self._writer = NativeWorker(socketio.sleep, "gravação do histórico")
+        self._reader = NativeWorker(socketio.sleep, "consultas do histórico")
+        self._debouncer = Debouncer(socketio, interval, lambda: self._writer.submit(self.flush),
+                                    "histórico de partidas")
+        # As conexões são criadas aqui e depois usadas só pelas suas threads (ou por close, com elas paradas)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, NORMAL só sincroniza o disco nos checkpoints
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+        self._read_db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._read_db.execute("PRAGMA busy_timeout=5000")
+
+    def record(self, match):
+        """Enfileira uma partida encerrada; a gravação acontece na próxima janela."""
+        match = dict(match, finished_at=time.time())
+        with self._lock:
+            self._pending.append(match)
+        self._debouncer.schedule()
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Grava as partidas enfileiradas numa única transação; retorna quantas foram gravadas.
+
+        Roda na thread do banco (ou em ``close``, com ela parada).
+        """
+        with self._lock:
+            matches, self._pending = self._pending, []
+        if not matches:
+            return 0
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT INTO matches (room_id, size, win_length, player_x, player_o, winner, moves,"
+                " bot_level, started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(m["room_id"], m["size"], m["win_length"], m["player_x"], m["player_o"], m["winner"],
+                  encode_moves(m["moves"]), m["bot_level"], m["started_at"], m["finished_at"])
+                 for m in matches]
+            )
+            for result, names in self._results(matches).items():
+                db.executemany(_UPSERT[result], [(name,) for name in names])
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            # Devolve o lote à fila para a próxima tentativa
+            with self._lock:
+                self._pending[:0] = matches
+            raise
+        self.recorded += len(matches)
+        logger.debug("%s partida(s) gravada(s) no histórico", len(matches))
+        return len(matches)
+
+    @staticmethod
+    def _results(matches):
+        results = {"wins": [], "losses": [], "draws": []}
+        for match in matches:
+            seats = [("X", match["player_x"])]
+            if match["bot_level"] is None:
+                seats.append(("O", match["player_o"]))
+            for mark, name in seats:
+                if not name:
+                    continue
+                if match["winner"] == "Draw":
+                    results["draws"].append(name)
+                elif match["winner"] == mark:
+                    results["wins"].append(name)
+                else:
+                    results["losses"].append(name)
+        return results
+
+    def _query(self, sql, params):
+        return self._read_db.execute(sql, params).fetchall()
+
+    def player_stats(self, name):
+        """Totais do jogador: {"name", "wins", "losses", "draws"} (zerados se nunca jogou)."""
+        rows = self._reader.call(self._query, "SELECT wins, losses, draws FROM players WHERE name = ?", (name,))
+        row = rows[0] if rows else None
+        wins, losses, draws = row or (0, 0, 0)
+        return {"name": name, "wins": wins, "losses": losses, "draws": draws}
+
+    def leaderboard(self, limit=10):
+        """Jogadores com mais vitórias (desempate: menos derrotas)."""
+        rows = self._reader.call(
+            self._query, "SELECT name, wins, losses, draws FROM players ORDER BY wins DESC, losses LIMIT ?", (limit,)
+        )
+        return [{"name": name, "wins": wins, "losses": losses, "draws": draws} for name, wins, losses, draws in rows]
+
+    def recent_matches(self, name, limit=20):
+        """Últimas partidas do jogador, com a sequência de jogadas."""
+        rows = self._reader.call(
+            self._query,
+            "SELECT * FROM (SELECT * FROM matches WHERE player_x = ? UNION ALL"
+            " SELECT * FROM matches WHERE player_o = ? AND player_x IS NOT ?)"
+            " ORDER BY finished_at DESC LIMIT ?", (name, name, name, limit)
+        )
+        columns = ("id", "room_id", "size", "win_length", "player_x", "player_o", "winner", "moves",
+                   "bot_level", "started_at", "finished_at")
+        matches = [dict(zip(columns, row)) for row in rows]
+        for match in matches:
+            match["moves"] = decode_moves(match["moves"])
+        return matches
+
+    def close(self):
+        """Grava o que ainda estiver na fila e fecha o banco (pode ser chamada mais de uma vez)."""
+        if self._db is None:
+            return
+        # Termina as tarefas já enfileiradas; depois disso as conexões são só desta thread
+        self._writer.stop()
+        self._reader.stop()
+        try:
+            self.flush()
+        finally:
+            self._read_db.close()
+            self._db.close()
+            self._db = None
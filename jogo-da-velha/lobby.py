@@ -0,0 +1,59 @@
+"""Transmissão agrupada da lista de salas para os clientes no lobby."""
+
+import threading
+
+from flask_socketio import join_room, leave_room
+
+from debounce import Debouncer
+
+
+class LobbyBroadcaster:
+    """Acumula mudanças na lista de salas abertas e envia um único diff por janela.
+
+    Apenas os clientes inscritos no lobby (grupo ``room`` do Socket.IO) recebem
+    os eventos ``rooms_diff``. Ao se inscrever, o cliente recebe a lista
+    completa em ``update_rooms``.
+    """
+
+    def __init__(self, socketio, get_rooms, interval=0.1, room="lobby"):
+        self.socketio = socketio
+        self.get_rooms = get_rooms
+        self.room = room
+        self._added = {}
+        self._removed = {}
+        self._lock = threading.Lock()
+        self._debouncer = Debouncer(socketio, interval, self.flush, "lista de salas")
+
+    def subscribe(self, sid):
+        """Inscreve o cliente no lobby e envia a lista completa de salas."""
+        join_room(self.room, sid=sid)
+        self.socketio.emit("update_rooms", {"rooms": self.get_rooms()}, to=sid)
+
+    def unsubscribe(self, sid):
+        """Remove o cliente do lobby (por exemplo, ao entrar em uma partida)."""
+        leave_room(self.room, sid=sid)
+
+    def room_opened(self, room_id):
+        with self._lock:
+            if room_id in self._removed:
+                del self._removed[room_id]
+            else:
+                self._added[room_id] = None
+        self._debouncer.schedule()
+
+    def room_closed(self, room_id):
+        with self._lock:
+            if room_id in self._added:
+                del self._added[room_id]
+            else:
+                self._removed[room_id] = None
+        self._debouncer.schedule()
+
+    def flush(self):
+        """Envia as mudanças acumuladas, se houver."""
+        with self._lock:
+            added, removed = list(self._added), list(self._removed)
+            self._added.clear()
+            self._removed.clear()
+        if added or removed:
+            self.socketio.emit("rooms_diff", {"added": added, "removed": removed}, to=self.room)
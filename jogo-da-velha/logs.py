@@ -0,0 +1,121 @@
+"""Configuração do logging do servidor.
+
+Os handlers só enfileiram os registros (QueueHandler); uma thread separada
+(QueueListener) formata e grava, então um disco ou stdout lento não segura os
+handlers do Socket.IO. Nos modos gevent e eventlet essa thread, a fila e o lock
+do handler de saída são os originais do sistema operacional (ver native.py):
+um greenlet bloqueado numa escrita pararia o servidor inteiro. Nível, formato e destino vêm das variáveis de ambiente
+LOG_LEVEL, LOG_FORMAT ("text" ou "json") e LOG_OUTPUT ("stderr", "stdout" ou o
+caminho de um arquivo).
+
+Importar o app não configura o logging; os pontos de entrada chamam
+``configure_logging``.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+
+from native import original
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Atributos padrão de LogRecord; o que vier além disso (via extra=) vai para o JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos passados em ``extra``."""
+
+    def format(self, record):
+        event = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                event[key] = value
+        if record.exc_info:
+            event["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class NativeQueueListener(logging.handlers.QueueListener):
+    """QueueListener que roda numa thread do sistema operacional mesmo com monkey patching."""
+
+    def start(self):
+        self._done = original("_thread", "allocate_lock")()
+        self._done.acquire()
+        self._thread = original("_thread", "start_new_thread")(self._run, ())
+
+    def _run(self):
+        try:
+            self._monitor()
+        finally:
+            self._done.release()
+
+    def stop(self):
+        if self._thread is not None:
+            self.enqueue_sentinel()
+            self._done.acquire()
+            self._thread = None
+
+
+def _output_handler(output):
+    if output == "stdout":
+        return logging.StreamHandler(sys.stdout)
+    if output == "stderr":
+        return logging.StreamHandler(sys.stderr)
+    return logging.FileHandler(output, encoding="utf-8")
+
+
+def configure_logging(level=None, fmt=None, output=None):
+    """Configura o logger raiz; argumentos omitidos vêm das variáveis de ambiente.
+
+    Pode ser chamada de novo para trocar a configuração: a fila anterior é
+    esvaziada e encerrada.
+    """
+    global _listener
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.environ.get("LOG_FORMAT", "text")
+    output = output or os.environ.get("LOG_OUTPUT", "stderr")
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Formato de log desconhecido: {fmt}")
+
+    if _listener is not None:
+        stop_logging()
+    handler = _output_handler(output)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    # Só a thread do listener usa o handler de saída; um lock do gevent não serve fora do hub
+    handler.lock = original("_thread", "RLock")()
+
+    log_queue = original("queue", "SimpleQueue")()
+    root = logging.getLogger()
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+        previous.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = NativeQueueListener(log_queue, handler)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def stop_logging():
+    """Grava o que ainda estiver na fila e encerra o listener (também chamada na saída)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,175 @@
+"""Métricas do servidor, expostas no formato de texto do Prometheus em /metrics."""
+
+import bisect
+import threading
+
+# Limites dos histogramas de latência, em segundos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """Base das métricas: uma série por combinação de valores de rótulos.
+
+    Sem rótulos, a própria métrica faz o papel da série (``counter.inc()``);
+    com rótulos, a série vem de ``labels`` (``counter.labels("make_move").inc()``).
+    """
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            # Séries sem rótulos aparecem em /metrics desde o início, mesmo zeradas
+            self._series[()] = self._new_series()
+
+    def labels(self, *values):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _default(self):
+        return self.labels()
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Contador que só cresce (por exemplo, salas despejadas)."""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, label_names=(), read=None):
+        super().__init__(name, help_text, label_names)
+        self.read = read
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def samples(self):
+        if self.read is not None:
+            yield self.name, "", self.read()
+            return
+        for values, series in list(self._series.items()):
+            yield self.name, _format_labels(self.label_names, values), series.value
+
+
+class Gauge(Counter):
+    """Valor instantâneo: lido de uma função no momento da coleta ou ajustado com inc/dec/set."""
+
+    type = "gauge"
+
+    def __init__(self, name, help_text, read=None, label_names=()):
+        super().__init__(name, help_text, label_names, read)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribuição de valores (latências) em faixas cumulativas."""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, label_names)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def samples(self):
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(self.label_names, values, [("le", bound)]), cumulative
+            yield self.name + "_sum", _format_labels(self.label_names, values), total
+            yield self.name + "_count", _format_labels(self.label_names, values), cumulative
+
+
+class MetricsRegistry:
+    """Conjunto de métricas do processo."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=(), read=None):
+        return self._register(Counter(name, help_text, label_names, read))
+
+    def gauge(self, name, help_text, read=None, label_names=()):
+        return self._register(Gauge(name, help_text, read, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        """Formata todas as métricas no formato de exposição de texto do Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
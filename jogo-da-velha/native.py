@@ -0,0 +1,95 @@
+"""Acesso às versões originais da biblioteca padrão nos modos gevent e eventlet.
+
+Com monkey patching, threading, _thread, queue e time passam a criar greenlets
+e primitivas cooperativas. Quem precisa de uma thread de verdade (o profiler,
+o listener do logging) pega as versões originais com ``original``;
+``NativeWorker`` executa chamadas bloqueantes (o SQLite do histórico) numa
+dessas threads.
+"""
+
+import importlib
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def original(module, name):
+    """Retorna ``module.name`` sem o monkey patching do gevent/eventlet."""
+    if "gevent.monkey" in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched(module):
+            return monkey.get_original(module, name)
+    if "eventlet.patcher" in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched(module.lstrip("_")):
+            return getattr(patcher.original(module), name)
+    return getattr(importlib.import_module(module), name)
+
+
+class _Job:
+    __slots__ = ("func", "args", "waited", "done", "result", "error")
+
+    def __init__(self, func, args, waited):
+        self.func = func
+        self.args = args
+        self.waited = waited
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class NativeWorker:
+    """Uma thread do sistema operacional que executa, em ordem, as funções enfileiradas.
+
+    ``submit`` só enfileira; ``call`` espera o resultado cedendo a vez com
+    ``sleep`` (o ``socketio.sleep`` do app), então o loop de eventos continua
+    rodando enquanto a thread trabalha. Exceções de funções enfileiradas com
+    ``submit`` vão para o log.
+    """
+
+    def __init__(self, sleep, name, poll_interval=0.001):
+        self.sleep = sleep
+        self.name = name
+        self.poll_interval = poll_interval
+        self._jobs = original("queue", "SimpleQueue")()
+        self._done = original("_thread", "allocate_lock")()
+        self._done.acquire()
+        self._running = True
+        original("_thread", "start_new_thread")(self._run, ())
+
+    def submit(self, func, *args):
+        self._jobs.put(_Job(func, args, False))
+
+    def call(self, func, *args):
+        """Executa ``func(*args)`` na thread e retorna o resultado (ou levanta a exceção)."""
+        job = _Job(func, args, True)
+        self._jobs.put(job)
+        while not job.done:
+            self.sleep(self.poll_interval)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stop(self):
+        """Executa o que já estiver na fila e encerra a thread (pode ser chamada mais de uma vez)."""
+        if self._running:
+            self._running = False
+            self._jobs.put(None)
+            self._done.acquire()
+
+    def _run(self):
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                try:
+                    job.result = job.func(*job.args)
+                except Exception as error:
+                    job.error = error
+                    if not job.waited:
+                        logger.exception("Falha numa tarefa de %s", self.name)
+                job.done = True
+        finally:
+            self._done.release()
@@ -0,0 +1,81 @@
+"""Profiler por amostragem que pode ser ligado e desligado com o servidor rodando.
+
+Uma thread do sistema operacional lê as pilhas de todas as threads a cada
+``interval`` segundos e conta as pilhas vistas. O resultado sai no formato
+"collapsed" (uma pilha por linha, frames separados por ";" e a contagem no
+final), aceito por flamegraph.pl e speedscope.
+
+Nos modos gevent e eventlet a thread de amostragem, seu lock e seu sleep vêm
+das versões originais de _thread e time, para que ela não vire um greenlet que
+só enxergaria a si mesmo.
+"""
+
+import sys
+import time
+from collections import Counter
+
+from native import original
+
+
+def _collapse(frame, max_depth):
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Conta as pilhas de execução amostradas enquanto estiver ligado."""
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.started_at = None
+        self._stacks = Counter()
+        self._running = False
+        self._generation = 0
+        self._lock = original("_thread", "allocate_lock")()
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Liga a amostragem, descartando o resultado anterior; retorna False se já estava ligada."""
+        with self._lock:
+            if self._running:
+                return False
+            self._stacks = Counter()
+            self.samples = 0
+            self.started_at = time.time()
+            self._running = True
+            self._generation += 1
+        original("_thread", "start_new_thread")(self._sample_loop, (self._generation,))
+        return True
+
+    def stop(self):
+        """Desliga a amostragem e retorna as pilhas no formato collapsed."""
+        self._running = False
+        return self.collapsed()
+
+    def collapsed(self):
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _sample_loop(self, generation):
+        sleep = original("time", "sleep")
+        me = original("_thread", "get_ident")()
+        # Um stop seguido de start cria outra thread; esta encerra ao ver a geração nova
+        while self._running and generation == self._generation:
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id != me:
+                        self._stacks[_collapse(frame, self.max_depth)] += 1
+                self.samples += 1
+            del frames
+            sleep(self.interval)
@@ -0,0 +1,172 @@
+"""Modelo das salas: objetos com __slots__ no lugar de dicionários aninhados.
+
+O tabuleiro é o bitboard de ``engine`` (uma lista de dois inteiros), reiniciado
+no lugar a cada nova partida; ``size`` e ``win_length`` escolhem as regras
+(3×3 clássico por padrão). A conversão para o JSON enviado aos clientes e
+para o formato guardado no Redis fica apenas aqui.
+"""
+
+import time
+
+from engine import SIZE, new_board, rules_for
+
+
+class Player:
+    """Jogador sentado em uma sala.
+
+    ``token`` permite retomar o assento depois de uma reconexão (outro sid);
+    ``away_since`` é o instante da desconexão enquanto o assento está reservado.
+    """
+
+    __slots__ = ("role", "name", "token", "away_since")
+
+    def __init__(self, role, name, token=None, away_since=None):
+        self.role = role
+        self.name = name
+        self.token = token
+        self.away_since = away_since
+
+
+class Room:
+    """Estado de uma sala (multiplayer ou contra o bot)."""
+
+    __slots__ = ("board", "current_player", "winner", "game_over", "scoreboard",
+                 "players", "is_bot_game", "bot_level", "seq", "size", "win_length", "moves", "started_at")
+
+    def __init__(self, is_bot_game=False, bot_level=None, size=SIZE, win_length=SIZE):
+        self.board = new_board()
+        self.current_player = "X"
+        self.winner = None
+        self.game_over = False
+        self.scoreboard = {"Draw": 0}
+        # sid do Socket.IO -> Player; no jogo contra o bot, o bot fica em "bot"
+        self.players = {}
+        self.is_bot_game = is_bot_game
+        self.bot_level = bot_level
+        self.seq = 0
+        self.size = size
+        self.win_length = win_length
+        # Casas jogadas na partida atual, em ordem, para o histórico
+        self.moves = []
+        self.started_at = time.time()
+
+    @property
+    def rules(self):
+        return rules_for(self.size, self.win_length)
+
+    def add_player(self, sid, role, name, token=None):
+        self.players[sid] = Player(role, name, token)
+        self.scoreboard[name] = 0
+        # A partida começa quando o segundo jogador senta, não quando a sala é criada
+        if self.is_full():
+            self.started_at = time.time()
+
+    def resume_player(self, token, sid):
+        """Passa o assento reservado do token para o novo sid; retorna o Player ou None se o token não vale aqui.
+
+        Só um assento com ``away_since`` pode ser retomado: se a conexão dona do
+        assento continua ativa (uma aba duplicada copia o token), o pedido é recusado.
+        """
+        for old_sid, player in self.players.items():
+            if token and player.token == token and player.away_since is not None:
+                del self.players[old_sid]
+                self.players[sid] = player
+                player.away_since = None
+                return player
+        return None
+
+    def remove_player(self, sid):
+        """Tira o jogador da sala e do placar; retorna o Player removido."""
+        player = self.players.pop(sid)
+        self.scoreboard.pop(player.name, None)
+        return player
+
+    def is_full(self):
+        return len(self.players) >= 2
+
+    def player_name(self, role):
+        for player in self.players.values():
+            if player.role == role:
+                return player.name
+        return None
+
+    def reset_board(self):
+        """Começa uma nova partida reaproveitando o tabuleiro; o seq avança para os clientes."""
+        self.board[0] = self.board[1] = 0
+        self.current_player = "X"
+        self.winner = None
+        self.game_over = False
+        self.seq += 1
+        self.moves.clear()
+        self.started_at = time.time()
+
+    def reset_scoreboard(self):
+        self.scoreboard = dict.fromkeys(("Draw", *(player.name for player in self.players.values())), 0)
+        self.reset_board()
+
+    def to_payload(self):
+        """Estado completo no formato JSON do evento "update"."""
+        return {
+            "board": self.rules.to_rows(self.board),
+            "current_player": self.current_player,
+            "winner": self.winner,
+            "game_over": self.game_over,
+            "scoreboard": dict(self.scoreboard),
+            "num_players": len(self.players),
+            "player_x_name": self.player_name("X"),
+            "player_o_name": self.player_name("O"),
+            "seq": self.seq,
+            "size": self.size,
+            "win_length": self.win_length
+        }
+
+    def to_snapshot(self):
+        """Estado compacto da retomada de sessão: o tabuleiro vai numa string de N² casas ("X", "O" ou ".")."""
+        x, o = self.board
+        return {
+            "board": "".join("X" if x >> i & 1 else "O" if o >> i & 1 else "." for i in range(self.size * self.size)),
+            "current_player": self.current_player,
+            "winner": self.winner,
+            "game_over": self.game_over,
+            "scoreboard": dict(self.scoreboard),
+            "num_players": len(self.players),
+            "player_x_name": self.player_name("X"),
+            "player_o_name": self.player_name("O"),
+            "away": [player.role for player in self.players.values() if player.away_since is not None],
+            "seq": self.seq,
+            "size": self.size,
+            "win_length": self.win_length
+        }
+
+    def to_dict(self):
+        """Formato serializável em JSON usado pelos backends que não guardam objetos."""
+        return {
+            "board": self.board,
+            "current_player": self.current_player,
+            "winner": self.winner,
+            "game_over": self.game_over,
+            "scoreboard": self.scoreboard,
+            "players": {sid: [player.role, player.name, player.token, player.away_since]
+                        for sid, player in self.players.items()},
+            "is_bot_game": self.is_bot_game,
+            "bot_level": self.bot_level,
+            "seq": self.seq,
+            "size": self.size,
+            "win_length": self.win_length,
+            "moves": self.moves,
+            "started_at": self.started_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        room = cls(data["is_bot_game"], data["bot_level"], data.get("size", SIZE), data.get("win_length", SIZE))
+        room.board = data["board"]
+        room.current_player = data["current_player"]
+        room.winner = data["winner"]
+        room.game_over = data["game_over"]
+        room.scoreboard = data["scoreboard"]
+        room.players = {sid: Player(*player) for sid, player in data["players"].items()}
+        room.seq = data["seq"]
+        room.moves = data.get("moves", [])
+        room.started_at = data.get("started_at", room.started_at)
+        return room
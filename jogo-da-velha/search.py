@@ -0,0 +1,160 @@
+"""Busca alfa-beta com limite de tempo para tabuleiros N×N (K em linha).
+
+O tabuleiro clássico 3×3 usa a tabela completa do ``solver``; nos maiores,
+onde a árvore não cabe na memória, o bot faz uma busca negamax com poda
+alfa-beta e aprofundamento iterativo até esgotar o tempo. As jogadas
+candidatas são só as casas vizinhas às marcas existentes, ordenadas por uma
+pontuação local (linhas que a jogada forma ou bloqueia), e a avaliação das
+folhas é a soma dessas pontuações ao longo do caminho.
+"""
+
+import time
+
+from engine import DIRECTIONS
+
+WIN_SCORE = 10 ** 9
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _line_value(length, open_ends, win_length):
+    """Valor de uma sequência de ``length`` marcas com 0, 1 ou 2 pontas livres."""
+    if length >= win_length:
+        return WIN_SCORE // 10
+    if open_ends == 0:
+        return 0
+    return 10 ** length * open_ends
+
+
+def _side(rules, bits, blocked, index, d_row, d_col):
+    """Retorna (marcas seguidas, ponta livre) a partir de ``index`` numa direção."""
+    size = rules.size
+    row, col = divmod(index, size)
+    count = 0
+    for _ in range(rules.win_length):
+        row += d_row
+        col += d_col
+        if not (0 <= row < size and 0 <= col < size):
+            return count, False
+        bit = 1 << (row * size + col)
+        if bits & bit:
+            count += 1
+        else:
+            return count, not blocked & bit
+    return count, False
+
+
+def move_score(rules, board, slot, index):
+    """Pontuação local da jogada: linhas que ela forma para ``slot`` mais as que bloqueia do adversário."""
+    own, other = board[slot], board[1 - slot]
+    attack = defense = 0
+    for d_row, d_col in DIRECTIONS:
+        forward, forward_open = _side(rules, own, other, index, d_row, d_col)
+        backward, backward_open = _side(rules, own, other, index, -d_row, -d_col)
+        attack += _line_value(1 + forward + backward, forward_open + backward_open, rules.win_length)
+        forward, forward_open = _side(rules, other, own, index, d_row, d_col)
+        backward, backward_open = _side(rules, other, own, index, -d_row, -d_col)
+        # Bloquear vale um pouco menos que atacar com a mesma força
+        defense += _line_value(1 + forward + backward, forward_open + backward_open, rules.win_length) * 4 // 5
+    return attack + defense
+
+
+class AlphaBetaBot:
+    """Escolhe jogadas por negamax com poda alfa-beta, ordenação de jogadas e limite de tempo."""
+
+    def __init__(self, rules, max_depth=4, branching=12):
+        self.rules = rules
+        self.max_depth = max_depth
+        self.branching = branching
+        self.nodes = 0
+        self.depth_reached = 0
+        self._deadline = None
+
+    def candidates(self, board, slot, timed=False):
+        """Casas vizinhas às marcas, da mais promissora para a menos, limitadas a ``branching``.
+
+        Com ``timed``, confere o prazo da busca a cada casa pontuada: num tabuleiro
+        grande e cheio, pontuar as vizinhas custa alguns milissegundos.
+        """
+        rules = self.rules
+        taken = board[0] | board[1]
+        if not taken:
+            center = rules.size // 2
+            return [rules.cell_index(center, center)]
+        area = rules.neighbors(taken, radius=1 if rules.size > 7 else 2) or (~taken & rules.full)
+        scored = []
+        for index in range(rules.cells):
+            if area >> index & 1:
+                if timed:
+                    self._check_deadline()
+                scored.append((move_score(rules, board, slot, index), index))
+        scored.sort(reverse=True)
+        return [index for _, index in scored[:self.branching]]
+
+    def choose(self, board, slot, budget):
+        """Retorna a melhor casa encontrada para ``slot`` em até ``budget`` segundos."""
+        self._deadline = time.perf_counter() + budget
+        self.nodes = 0
+        self.depth_reached = 0
+        # As candidatas da raiz são sempre calculadas (uma passada pelas vizinhas): sem elas não há jogada
+        moves = self.candidates(board, slot)
+        if not moves:
+            return None
+        best = moves[0]
+        board = list(board)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value, move = self._root(board, slot, depth, moves)
+            except _Timeout:
+                break
+            best, self.depth_reached = move, depth
+            if abs(value) >= WIN_SCORE:
+                break
+            # A melhor jogada da iteração anterior é a primeira da próxima (melhora as podas)
+            moves = [move] + [m for m in moves if m != move]
+        return best
+
+    def _root(self, board, slot, depth, moves):
+        alpha, best_move = -WIN_SCORE * 2, moves[0]
+        for index in moves:
+            value = self._play(board, slot, index, depth, alpha, WIN_SCORE * 2, 0)
+            if value > alpha:
+                alpha, best_move = value, index
+        return alpha, best_move
+
+    def _play(self, board, slot, index, depth, alpha, beta, score):
+        """Valor (para ``slot``) de jogar em ``index``; ``score`` é a avaliação acumulada até aqui."""
+        self._check_deadline()
+        rules = self.rules
+        gain = move_score(rules, board, slot, index)
+        bit = 1 << index
+        board[slot] |= bit
+        try:
+            if rules.wins_at(board[slot], index):
+                # Vitórias mais próximas valem mais
+                return WIN_SCORE + depth
+            if depth == 1 or (board[0] | board[1]) == rules.full:
+                return score + gain
+            return -self._negamax(board, 1 - slot, depth - 1, -beta, -alpha, -(score + gain))
+        finally:
+            board[slot] &= ~bit
+
+    def _negamax(self, board, slot, depth, alpha, beta, score):
+        self.nodes += 1
+        self._check_deadline()
+        best = -WIN_SCORE * 2
+        for index in self.candidates(board, slot, timed=True):
+            value = self._play(board, slot, index, depth, alpha, beta, score)
+            if value > best:
+                best = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+        return best
+
+    def _check_deadline(self):
+        if time.perf_counter() > self._deadline:
+            raise _Timeout
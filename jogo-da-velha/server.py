@@ -0,0 +1,49 @@
+"""Ponto de entrada de produção do servidor Socket.IO.
+
+Uso: python server.py [--mode gevent|eventlet|threading] [--host 0.0.0.0] [--port 5000]
+
+O modo também pode ser definido pela variável de ambiente SERVER_MODE. Nos
+modos cooperativos (gevent e eventlet) a biblioteca padrão é corrigida com
+monkey patching antes de importar o app, e o modo debug fica desligado.
+O logging segue LOG_LEVEL (padrão INFO), LOG_FORMAT e LOG_OUTPUT; ver logs.py.
+"""
+
+import argparse
+import os
+
+SERVER_MODES = ("gevent", "eventlet", "threading")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor do Jogo da Velha")
+    parser.add_argument("--mode", choices=SERVER_MODES, default=os.environ.get("SERVER_MODE", "gevent"),
+                        help="modelo de concorrência do servidor (padrão: gevent)")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mode == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+    elif args.mode == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+
+    # O listener do logging roda numa thread do sistema operacional mesmo depois do monkey patching (ver logs.py)
+    from logs import configure_logging
+    configure_logging()
+
+    # O app lê SERVER_MODE ao criar o SocketIO, então precisa ser importado depois
+    os.environ["SERVER_MODE"] = args.mode
+    from app import app, socketio, start_background_tasks
+
+    start_background_tasks()
+    socketio.run(app, host=args.host, port=args.port, debug=False, log_output=False,
+                 allow_unsafe_werkzeug=args.mode == "threading")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Simulador offline de partidas entre bots, sem Flask nem Socket.IO.
+
+Uso: python simulate.py --x hard --o random [--games 1000000] [--workers 4] [--size 3] [--out resultado.json]
+
+As partidas rodam em paralelo num pool de processos, em lotes de ``--chunk``
+partidas por tarefa, usando só o motor (engine), o solver e as decisões do bot
+(bots); o app não é importado. No 3×3 cada processo guarda as jogadas
+candidatas de cada posição já vista (são 5.478 posições alcançáveis), então,
+depois de aquecido, cada jogada é uma consulta a um dicionário.
+
+Jogadores: random (qualquer casa livre), easy e hard (os níveis do bot). O
+relatório traz as taxas de vitória de X, de O e de empates e as partidas por
+segundo. Com --check, sai com código 1 se o nível hard perder alguma partida no
+3×3, onde ele joga perfeitamente: serve de teste de regressão dos níveis do bot.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine import CELLS, CLASSIC, SIZE, check_winner, empty_cells, new_board, rules_for
+from bots import analyze_position, cheap_moves, choose_move
+
+PLAYERS = ("random", "easy", "hard")
+
+# Jogadas candidatas por (jogador, posição x | o << 9) no 3×3, preenchidas sob demanda em cada processo
+_candidates = {}
+
+
+def candidates(player, board, slot):
+    """Jogadas entre as quais ``player`` sorteia na posição (a mesma distribuição do bot no servidor)."""
+    key = (player, board[0] | board[1] << CELLS)
+    moves = _candidates.get(key)
+    if moves is None:
+        if player == "hard":
+            moves = tuple(analyze_position(board)[1])
+        elif player == "easy":
+            moves = tuple(cheap_moves(board, CLASSIC, slot))
+        else:
+            moves = tuple(empty_cells(board))
+        _candidates[key] = moves
+    return moves
+
+
+def pick_move(player, board, slot, rules, budget):
+    if rules is CLASSIC:
+        return random.choice(candidates(player, board, slot))
+    if player == "random":
+        return random.choice(rules.empty_cells(board))
+    return choose_move(board, player, rules.size, rules.win_length, budget, slot)
+
+
+def play_games(players, size, win_length, games, seed, budget):
+    """Joga ``games`` partidas entre players[0] (X) e players[1] (O); roda no pool.
+
+    Retorna ({"X": vitórias, "O": vitórias, "Draw": empates}, jogadas).
+    """
+    random.seed(seed)
+    rules = rules_for(size, win_length)
+    winner_of = check_winner if rules is CLASSIC else rules.check_winner
+    results = {"X": 0, "O": 0, "Draw": 0}
+    plies = 0
+    for _ in range(games):
+        board = new_board()
+        slot = 0
+        while True:
+            index = pick_move(players[slot], board, slot, rules, budget)
+            board[slot] |= 1 << index
+            plies += 1
+            winner = winner_of(board, index)
+            if winner:
+                break
+            slot ^= 1
+        results[winner] += 1
+    return results, plies
+
+
+def simulate(players, games, size=SIZE, win_length=SIZE, workers=None, chunk=10000, seed=None, budget=0.01):
+    """Distribui as partidas pelo pool e soma os resultados; retorna o relatório."""
+    workers = workers or os.cpu_count() or 1
+    seed = random.randrange(1 << 32) if seed is None else seed
+    results = {"X": 0, "O": 0, "Draw": 0}
+    plies = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(play_games, players, size, win_length, min(chunk, games - offset), seed + number, budget)
+            for number, offset in enumerate(range(0, games, chunk))
+        ]
+        for future in as_completed(futures):
+            chunk_results, chunk_plies = future.result()
+            for outcome, count in chunk_results.items():
+                results[outcome] += count
+            plies += chunk_plies
+    elapsed = time.perf_counter() - started
+    return {
+        "x": players[0],
+        "o": players[1],
+        "board": f"{size}x{size}/{win_length}",
+        "games": games,
+        "x_wins": results["X"],
+        "o_wins": results["O"],
+        "draws": results["Draw"],
+        "x_win_rate": round(100 * results["X"] / games, 3),
+        "o_win_rate": round(100 * results["O"] / games, 3),
+        "draw_rate": round(100 * results["Draw"] / games, 3),
+        "moves": plies,
+        "seconds": round(elapsed, 2),
+        "games_per_second": round(games / elapsed, 1) if elapsed else None,
+        "workers": workers,
+        "seed": seed
+    }
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"deve ser pelo menos 1: {text}")
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--x", choices=PLAYERS, default="hard", help="jogador X (começa)")
+    parser.add_argument("--o", choices=PLAYERS, default="random", help="jogador O")
+    parser.add_argument("--games", type=positive_int, default=100000)
+    parser.add_argument("--workers", type=positive_int, help="processos do pool (padrão: número de CPUs)")
+    parser.add_argument("--chunk", type=positive_int, default=10000, help="partidas por tarefa do pool")
+    parser.add_argument("--size", type=int, default=SIZE, help="tamanho do tabuleiro")
+    parser.add_argument("--win-length", type=int, help="marcas em linha para vencer (padrão: min(tamanho, 5))")
+    parser.add_argument("--budget", type=float, default=10, help="tempo da busca do hard nos tabuleiros maiores, em ms")
+    parser.add_argument("--seed", type=int, help="semente dos sorteios, para repetir uma simulação")
+    parser.add_argument("--check", action="store_true", help="falha se o hard perder no 3x3")
+    parser.add_argument("--out", help="arquivo JSON do relatório")
+    args = parser.parse_args(argv)
+
+    win_length = args.win_length or min(args.size, 5)
+    report = simulate((args.x, args.o), args.games, args.size, win_length, args.workers, args.chunk,
+                      args.seed, args.budget / 1000)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as result:
+            result.write(output + "\n")
+
+    if args.check and (args.size, win_length) == (SIZE, SIZE):
+        losses = {"X": report["o_wins"] if args.x == "hard" else 0, "O": report["x_wins"] if args.o == "hard" else 0}
+        for mark, count in losses.items():
+            if count:
+                print(f"FALHOU: o nível hard ({mark}) perdeu {count} partida(s)", file=sys.stderr)
+        if any(losses.values()):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Tabela de transposição com o valor minimax de todas as posições do jogo.
+
+A tabela é construída uma única vez na importação do módulo. Cada posição
+alcançável é indexada por ``x | o << 9`` e guarda, em 16 bits, o valor para o
+jogador da vez (-1, 0 ou 1) e a máscara das jogadas ótimas.
+"""
+
+from array import array
+
+from engine import CELLS, FULL, LINES
+
+MOVES_MASK = FULL
+VALUE_SHIFT = CELLS
+
+_table = array("H", bytes(2 * (1 << 2 * CELLS)))
+# Pontuações com profundidade, usadas apenas durante a construção
+_scores = {}
+
+
+def _key(x, o):
+    return x | o << CELLS
+
+
+def _solve(x, o, to_move, depth):
+    """Minimax completo; retorna a pontuação (ajustada pela profundidade) para quem joga."""
+    key = _key(x, o)
+    entry = _table[key]
+    if entry:
+        return (entry >> VALUE_SHIFT) - 2, _scores[key]
+
+    # A última jogada foi do adversário: só ele pode ter vencido
+    last = o if to_move == "X" else x
+    if any(last & line == line for line in LINES):
+        value, score = -1, -(10 - depth)
+    elif x | o == FULL:
+        value, score = 0, 0
+    else:
+        best = None
+        best_moves = 0
+        free = ~(x | o) & FULL
+        for index in range(CELLS):
+            if not free >> index & 1:
+                continue
+            bit = 1 << index
+            if to_move == "X":
+                child_value, child_score = _solve(x | bit, o, "O", depth + 1)
+            else:
+                child_value, child_score = _solve(x, o | bit, "X", depth + 1)
+            move_score = -child_score
+            if best is None or move_score > best:
+                best, best_moves, value = move_score, bit, -child_value
+            elif move_score == best:
+                best_moves |= bit
+        score = best
+        _table[key] = (value + 2) << VALUE_SHIFT | best_moves
+        _scores[key] = score
+        return value, score
+
+    _table[key] = (value + 2) << VALUE_SHIFT
+    _scores[key] = score
+    return value, score
+
+
+_solve(0, 0, "X", 0)
+POSITIONS = len(_scores)
+del _scores
+
+
+def lookup(board):
+    """Retorna (valor, máscara de jogadas ótimas) para o jogador da vez.
+
+    O valor é 1 (vitória), 0 (empate) ou -1 (derrota) com jogo perfeito.
+    Retorna None se a posição não for alcançável.
+    """
+    entry = _table[_key(board[0], board[1])]
+    if not entry:
+        return None
+    return (entry >> VALUE_SHIFT) - 2, entry & MOVES_MASK
+
+
+def best_moves(board):
+    """Retorna os índices das jogadas ótimas para o jogador da vez."""
+    result = lookup(board)
+    if result is None:
+        return []
+    moves = result[1]
+    return [i for i in range(CELLS) if moves >> i & 1]
+
@@ -0,0 +1,148 @@
+"""Espectadores das salas: transmissão agrupada para grandes audiências.
+
+Os espectadores de uma sala ficam num grupo próprio do Socket.IO
+(``watch:<sala>``), separado do grupo dos jogadores. Os jogadores recebem os
+eventos na hora, pelo caminho de sempre; para os espectadores os eventos são
+acumulados por ``interval`` segundos e enviados por uma tarefa de fundo num
+único ``spectate`` por janela. O Socket.IO serializa um emit para um grupo uma
+única vez, qualquer que seja o número de destinatários.
+
+Os espectadores de cada sala ficam registrados no store, então o limite por
+sala e as contagens valem para todos os processos (com STATE_BACKEND=redis).
+Os eventos são agrupados por sala no processo que aplica a jogada e emitidos
+para o grupo ``watch:<sala>``, que a fila de mensagens entrega aos espectadores
+de qualquer processo.
+
+Espectadores cuja fila de envio passa de ``max_backlog`` pacotes (conexão lenta)
+são desconectados, para não acumular memória no servidor; essa varredura é
+feita por cada processo nos seus próprios clientes.
+"""
+
+import threading
+import time
+
+from flask_socketio import join_room, leave_room
+
+from debounce import Debouncer
+
+
+class SpectatorHub:
+    """Espectadores por sala, com limite por sala e contagem enviada aos jogadores."""
+
+    def __init__(self, socketio, store, interval=0.05, max_viewers=5000, max_backlog=256, sweep_interval=1.0):
+        self.socketio = socketio
+        self.store = store
+        self.max_viewers = max_viewers
+        self.max_backlog = max_backlog
+        self.sweep_interval = sweep_interval
+        self.dropped = 0
+        # Só os espectadores conectados a este processo (o total por sala fica no store)
+        self._viewers = {}
+        self._watching = {}
+        self._pending = {}
+        self._counts_changed = set()
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._debouncer = Debouncer(socketio, interval, self.flush, "transmissão aos espectadores")
+
+    @staticmethod
+    def group(room_id):
+        return f"watch:{room_id}"
+
+    def watch(self, sid, room_id):
+        """Inscreve o cliente como espectador da sala; retorna False se a sala já está lotada."""
+        if not self.store.add_viewer(room_id, sid, self.max_viewers):
+            return False
+        with self._lock:
+            self._viewers.setdefault(room_id, set()).add(sid)
+            self._watching[sid] = room_id
+            self._counts_changed.add(room_id)
+            self._debouncer.schedule()
+        join_room(self.group(room_id), sid=sid)
+        return True
+
+    def unwatch(self, sid, leave=True):
+        """Remove o espectador; ``leave=False`` quando o Socket.IO já o tirou dos grupos (desconexão)."""
+        with self._lock:
+            room_id = self._watching.pop(sid, None)
+            if room_id is None:
+                return None
+            viewers = self._viewers.get(room_id)
+            if viewers is not None:
+                viewers.discard(sid)
+                if not viewers:
+                    del self._viewers[room_id]
+            self._counts_changed.add(room_id)
+            self._debouncer.schedule()
+        self.store.remove_viewer(room_id, sid)
+        if leave:
+            leave_room(self.group(room_id), sid=sid)
+        return room_id
+
+    def room_of(self, sid):
+        return self._watching.get(sid)
+
+    def viewer_count(self, room_id):
+        """Espectadores da sala em todos os processos."""
+        return self.store.viewer_count(room_id)
+
+    def total_viewers(self):
+        """Espectadores conectados a este processo."""
+        return len(self._watching)
+
+    def publish(self, room_id, event, data):
+        """Enfileira um evento da sala para os espectadores (ignorado se ninguém assiste, em nenhum processo)."""
+        if not self.store.viewer_count(room_id):
+            return
+        with self._lock:
+            self._pending.setdefault(room_id, []).append([event, data])
+            self._debouncer.schedule()
+
+    def close(self, room_id):
+        """Encerra a transmissão de uma sala removida, avisando os espectadores de todos os processos.
+
+        Nos outros processos, os espectadores continuam listados localmente até
+        saírem ou desconectarem; o store já não os conta.
+        """
+        count = self.store.clear_viewers(room_id)
+        with self._lock:
+            for sid in self._viewers.pop(room_id, ()):
+                self._watching.pop(sid, None)
+            self._pending.pop(room_id, None)
+            self._counts_changed.discard(room_id)
+        if count:
+            self.socketio.emit("watch_ended", {"room_id": room_id}, to=self.group(room_id))
+            self.socketio.close_room(self.group(room_id))
+
+    def flush(self):
+        """Envia os eventos acumulados de cada sala e as contagens de espectadores que mudaram."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            changed, self._counts_changed = self._counts_changed, set()
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = time.monotonic()
+            self._drop_laggy()
+        for room_id, events in pending.items():
+            self.socketio.emit("spectate", {"room_id": room_id, "events": events}, to=self.group(room_id))
+            # Cede a vez entre salas para não segurar o loop de eventos com várias audiências grandes
+            self.socketio.sleep(0)
+        for room_id in changed:
+            count = {"room_id": room_id, "viewers": self.viewer_count(room_id)}
+            self.socketio.emit("viewers", count, to=room_id)
+            self.socketio.emit("viewers", count, to=self.group(room_id))
+
+    def _backlog(self, sid):
+        """Pacotes ainda na fila de envio do cliente (0 se o servidor não expõe a fila)."""
+        server = self.socketio.server
+        try:
+            socket = server.eio.sockets[server.manager.eio_sid_from_sid(sid, "/")]
+            return socket.queue.qsize()
+        except (AttributeError, KeyError, TypeError):
+            return 0
+
+    def _drop_laggy(self):
+        laggy = [sid for sid in list(self._watching) if self._backlog(sid) > self.max_backlog]
+        for sid in laggy:
+            self.unwatch(sid, leave=False)
+            self.socketio.server.disconnect(sid, namespace="/")
+        self.dropped += len(laggy)
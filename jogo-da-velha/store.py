@@ -0,0 +1,311 @@
+"""Backends de armazenamento do estado das salas.
+
+O app acessa salas, o índice de salas abertas e as sessões apenas pelos
+métodos abaixo, o que permite trocar o armazenamento em memória (padrão, um
+único processo) por um servidor Redis compartilhado entre vários processos.
+
+Os estados de sala são objetos ``room.Room``: o backend em memória guarda os
+próprios objetos e o Redis os serializa com ``to_dict``/``from_dict``. Quem
+altera um estado obtido com ``get_room`` deve fazê-lo dentro de
+``lock(room_id)`` e chamar ``save_room`` antes de liberar o lock.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from room import Room
+
+
+class MemoryStore:
+    """Estado das salas na memória do processo."""
+
+    def __init__(self):
+        self._rooms = {}
+        self._locks = {}
+        # Última atividade de cada sala, da mais antiga para a mais recente
+        self._activity = OrderedDict()
+        self._activity_lock = threading.Lock()
+        self._open_rooms = OrderedDict()
+        self._index_lock = threading.Lock()
+        self._create_lock = threading.Lock()
+        self._sessions = {}
+        self._viewers = {}
+        self._viewers_lock = threading.Lock()
+
+    def lock(self, room_id):
+        """Retorna o lock da sala; operações de leitura-alteração-escrita devem ocorrer dentro dele.
+
+        Salas inexistentes não ganham lock (evita acumular locks para IDs inválidos);
+        quem o obtiver vai encontrar ``get_room`` retornando None.
+        """
+        return self._locks.get(room_id) or nullcontext()
+
+    # Salas
+    def get_room(self, room_id):
+        return self._rooms.get(room_id)
+
+    def save_room(self, room_id, state):
+        # setdefault é atômico, então dois handlers nunca recebem locks diferentes para a mesma sala
+        self._locks.setdefault(room_id, threading.Lock())
+        self._rooms[room_id] = state
+        with self._activity_lock:
+            self._activity[room_id] = time.monotonic()
+            self._activity.move_to_end(room_id)
+
+    def delete_room(self, room_id):
+        self._rooms.pop(room_id, None)
+        self._locks.pop(room_id, None)
+        with self._activity_lock:
+            self._activity.pop(room_id, None)
+
+    def room_count(self):
+        return len(self._rooms)
+
+    def idle_rooms(self, max_idle, limit=1000):
+        """Retorna até ``limit`` salas sem atividade há mais de ``max_idle`` segundos."""
+        cutoff = time.monotonic() - max_idle
+        idle = []
+        with self._activity_lock:
+            for room_id, last_activity in self._activity.items():
+                if last_activity > cutoff or len(idle) >= limit:
+                    break
+                idle.append(room_id)
+        return idle
+
+    def is_idle(self, room_id, max_idle):
+        last_activity = self._activity.get(room_id)
+        return last_activity is not None and last_activity <= time.monotonic() - max_idle
+
+    def create_room(self, room_id, state, max_rooms):
+        """Salva uma sala nova se o total de salas ainda estiver abaixo de ``max_rooms``."""
+        with self._create_lock:
+            if room_id not in self._rooms and len(self._rooms) >= max_rooms:
+                return False
+            self.save_room(room_id, state)
+            return True
+
+    # Índice de salas multiplayer abertas, da mais antiga para a mais nova
+    def open_room(self, room_id):
+        """Marca a sala como aberta; retorna True se ela não estava no índice."""
+        with self._index_lock:
+            if room_id in self._open_rooms:
+                return False
+            self._open_rooms[room_id] = None
+            return True
+
+    def close_room(self, room_id):
+        """Remove a sala do índice; retorna True se ela estava no índice."""
+        with self._index_lock:
+            if room_id not in self._open_rooms:
+                return False
+            del self._open_rooms[room_id]
+            return True
+
+    def is_open(self, room_id):
+        return room_id in self._open_rooms
+
+    def first_open_room(self):
+        with self._index_lock:
+            return next(iter(self._open_rooms), None)
+
+    def open_room_count(self):
+        return len(self._open_rooms)
+
+    def list_open_rooms(self):
+        # list() copia o índice sem liberar o GIL, então a consulta do lobby não precisa de lock
+        return list(self._open_rooms)
+
+    # Sessões: sid do Socket.IO -> {"room_id": ..., "role": ...}
+    def set_session(self, sid, session):
+        self._sessions[sid] = session
+
+    def get_session(self, sid):
+        return self._sessions.get(sid)
+
+    def pop_session(self, sid):
+        return self._sessions.pop(sid, None)
+
+    def session_count(self):
+        return len(self._sessions)
+
+    # Espectadores: sids que assistem a cada sala
+    def add_viewer(self, room_id, sid, max_viewers):
+        """Registra o espectador na sala; retorna False se ela já tem ``max_viewers``."""
+        with self._viewers_lock:
+            viewers = self._viewers.setdefault(room_id, set())
+            if sid not in viewers and len(viewers) >= max_viewers:
+                return False
+            viewers.add(sid)
+            return True
+
+    def remove_viewer(self, room_id, sid):
+        with self._viewers_lock:
+            viewers = self._viewers.get(room_id)
+            if viewers is not None:
+                viewers.discard(sid)
+                if not viewers:
+                    del self._viewers[room_id]
+
+    def viewer_count(self, room_id):
+        return len(self._viewers.get(room_id, ()))
+
+    def clear_viewers(self, room_id):
+        """Remove todos os espectadores da sala; retorna quantos eram."""
+        with self._viewers_lock:
+            return len(self._viewers.pop(room_id, ()))
+
+
+class RedisStore:
+    """Estado das salas em um servidor Redis (ou compatível), compartilhado entre processos.
+
+    Cada sala fica em ``<prefix>room:<id>`` como JSON, o índice de salas
+    abertas em um sorted set ordenado pela ordem de abertura, as sessões em
+    um hash e os espectadores de cada sala em um set.
+    """
+
+    def __init__(self, url, prefix="velha:"):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self.prefix = prefix
+        self._open_key = prefix + "open_rooms"
+        self._open_seq_key = prefix + "open_seq"
+        self._sessions_key = prefix + "sessions"
+        self._rooms_key = prefix + "rooms"
+        self._activity_key = prefix + "activity"
+
+    def _room_key(self, room_id):
+        return f"{self.prefix}room:{room_id}"
+
+    def lock(self, room_id):
+        """Lock distribuído da sala, válido entre todos os processos."""
+        return self.redis.lock(f"{self.prefix}lock:{room_id}", timeout=10, blocking_timeout=10)
+
+    # Salas
+    def get_room(self, room_id):
+        raw = self.redis.get(self._room_key(room_id))
+        return Room.from_dict(json.loads(raw)) if raw is not None else None
+
+    def save_room(self, room_id, state):
+        with self.redis.pipeline() as pipe:
+            pipe.set(self._room_key(room_id), json.dumps(state.to_dict(), separators=(",", ":")))
+            pipe.sadd(self._rooms_key, room_id)
+            pipe.zadd(self._activity_key, {room_id: time.time()})
+            pipe.execute()
+
+    def delete_room(self, room_id):
+        with self.redis.pipeline() as pipe:
+            pipe.delete(self._room_key(room_id))
+            pipe.srem(self._rooms_key, room_id)
+            pipe.zrem(self._activity_key, room_id)
+            pipe.execute()
+
+    def room_count(self):
+        return self.redis.scard(self._rooms_key)
+
+    def idle_rooms(self, max_idle, limit=1000):
+        idle = self.redis.zrangebyscore(self._activity_key, "-inf", time.time() - max_idle, start=0, num=limit)
+        return [room_id.decode() for room_id in idle]
+
+    def is_idle(self, room_id, max_idle):
+        last_activity = self.redis.zscore(self._activity_key, room_id)
+        return last_activity is not None and last_activity <= time.time() - max_idle
+
+    def create_room(self, room_id, state, max_rooms):
+        # O limite é conferido e a sala gravada numa transação: se outro processo
+        # criar ou apagar salas no meio, a transação é refeita
+        while True:
+            with self.redis.pipeline() as pipe:
+                try:
+                    pipe.watch(self._rooms_key)
+                    if not pipe.sismember(self._rooms_key, room_id) and pipe.scard(self._rooms_key) >= max_rooms:
+                        return False
+                    pipe.multi()
+                    pipe.set(self._room_key(room_id), json.dumps(state.to_dict(), separators=(",", ":")))
+                    pipe.sadd(self._rooms_key, room_id)
+                    pipe.zadd(self._activity_key, {room_id: time.time()})
+                    pipe.execute()
+                    return True
+                except self._watch_error:
+                    continue
+
+    # Índice de salas multiplayer abertas
+    def open_room(self, room_id):
+        order = self.redis.incr(self._open_seq_key)
+        return bool(self.redis.zadd(self._open_key, {room_id: order}, nx=True))
+
+    def close_room(self, room_id):
+        return bool(self.redis.zrem(self._open_key, room_id))
+
+    def is_open(self, room_id):
+        return self.redis.zscore(self._open_key, room_id) is not None
+
+    def first_open_room(self):
+        first = self.redis.zrange(self._open_key, 0, 0)
+        return first[0].decode() if first else None
+
+    def open_room_count(self):
+        return self.redis.zcard(self._open_key)
+
+    def list_open_rooms(self):
+        return [room_id.decode() for room_id in self.redis.zrange(self._open_key, 0, -1)]
+
+    # Sessões
+    def set_session(self, sid, session):
+        self.redis.hset(self._sessions_key, sid, json.dumps(session))
+
+    def get_session(self, sid):
+        raw = self.redis.hget(self._sessions_key, sid)
+        return json.loads(raw) if raw is not None else None
+
+    def pop_session(self, sid):
+        with self.redis.pipeline() as pipe:
+            pipe.hget(self._sessions_key, sid)
+            pipe.hdel(self._sessions_key, sid)
+            raw, _ = pipe.execute()
+        return json.loads(raw) if raw is not None else None
+
+    def session_count(self):
+        return self.redis.hlen(self._sessions_key)
+
+    # Espectadores
+    def _viewers_key(self, room_id):
+        return f"{self.prefix}viewers:{room_id}"
+
+    def add_viewer(self, room_id, sid, max_viewers):
+        # Inscreve e confere o limite numa só ida ao Redis; quem passou do limite se retira
+        key = self._viewers_key(room_id)
+        with self.redis.pipeline() as pipe:
+            pipe.sadd(key, sid)
+            pipe.scard(key)
+            added, count = pipe.execute()
+        if added and count > max_viewers:
+            self.redis.srem(key, sid)
+            return False
+        return True
+
+    def remove_viewer(self, room_id, sid):
+        self.redis.srem(self._viewers_key(room_id), sid)
+
+    def viewer_count(self, room_id):
+        return self.redis.scard(self._viewers_key(room_id))
+
+    def clear_viewers(self, room_id):
+        with self.redis.pipeline() as pipe:
+            pipe.scard(self._viewers_key(room_id))
+            pipe.delete(self._viewers_key(room_id))
+            count, _ = pipe.execute()
+        return count
+
+
+def create_store(backend="memory", url=None):
+    """Cria o backend configurado ("memory" ou "redis")."""
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "redis":
+        return RedisStore(url or "redis://localhost:6379/0")
+    raise ValueError(f"Backend de estado desconhecido: {backend}")